@@ -2,19 +2,15 @@ import json
 import logging
 from typing import List
 
+from shared.clients import get_pinecone
 from shared.embeddings import compute_embeddings
 
 
 def _try_pinecone_embed(text: str):
-    from pinecone import Pinecone
-    import json
-
-    cfg = json.load(open("config.json")).get("pinecone", {})
-    api_key = cfg.get("api_key")
-    if not api_key:
+    pc = get_pinecone()
+    if pc is None:
         raise RuntimeError("pinecone api_key missing")
 
-    pc = Pinecone(api_key=api_key)
     info = pc.describe_index("graphi")
     print("Graphi info", info)
     resp = pc.inference.embed(model="", inputs=[text])
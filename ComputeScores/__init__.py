@@ -3,31 +3,21 @@ import logging
 from typing import Dict, List
 
 from shared.utils import normalize_doi
-from shared.pinecone_client import get_pinecone_index
-
-
-def _cosine(a, b):
-    # simple cosine similarity
-    if not a or not b:
-        return 0.0
-    try:
-        dot = sum(x * y for x, y in zip(a, b))
-        import math
-
-        na = math.sqrt(sum(x * x for x in a))
-        nb = math.sqrt(sum(x * x for x in b))
-        if na == 0 or nb == 0:
-            return 0.0
-        return dot / (na * nb)
-    except Exception:
-        return 0.0
+from shared.pinecone_client import fetch_vectors, get_pinecone_index, query_scores, score_mode
+from shared.scoring import scores_for_rows
 
 
 def main(params: dict) -> Dict[str, float]:
     """Compute similarity scores between parent DOI and children DOIs using Pinecone.
 
-    params: { "parent": <doi>, "children": [<doi>, ...] }
+    params: { "parent": <doi>, "children": [<doi>, ...], "mode": "fetch"|"query" }
     returns: { child_doi: score }
+
+    "fetch" (default): vectors are fetched in parallel chunks and all
+    children are scored at once (see shared.scoring). "query": Pinecone
+    scores the children server-side and only IDs and scores come back;
+    children the query does not return are scored with "fetch". Children
+    without a vector in the index score 0.0 without affecting the others.
     """
     parent = params.get("parent")
     children = params.get("children") or []
@@ -38,18 +28,23 @@ def main(params: dict) -> Dict[str, float]:
 
     try:
         parent_id = normalize_doi(parent)
-        # fetch vectors for parent and children
-        ids = [parent_id] + [normalize_doi(c) for c in children]
-
-        res = idx.fetch(ids=ids, namespace="my-namespace")
-        parent_vec = res.vectors[parent_id].values
-
-        scores = {}
-        for c in children:
-            cid = normalize_doi(c)
-            child_vec = res.vectors[cid].values
-            scores[c] = float(_cosine(parent_vec, child_vec)) if child_vec else 0.0
-        return scores
+        child_ids = [normalize_doi(c) for c in children]
+
+        by_id = {}
+        if score_mode(params.get("mode")) == "query":
+            try:
+                by_id = query_scores(idx, parent_id, child_ids)
+            except Exception:
+                logging.warning("Pinecone query scoring failed; fetching vectors instead", exc_info=True)
+
+        rest = [cid for cid in child_ids if cid not in by_id]
+        if rest:
+            # fetch vectors for parent and the remaining children
+            matrix, rows = fetch_vectors(idx, [parent_id] + rest)
+            if parent_id not in rows:
+                logging.warning("No vector for parent %s; remaining children score 0", parent)
+            by_id.update(zip(rest, scores_for_rows(parent_id, rest, matrix, rows)))
+        return {c: float(by_id.get(cid, 0.0)) for c, cid in zip(children, child_ids)}
     except Exception:
         logging.exception("ComputeScores failed")
         return {c: 0.0 for c in children}
@@ -3,13 +3,9 @@ import logging
 
 import azure.functions as func
 
+from shared.clients import COSMOS, get_config, get_cosmos_container, get_redis, reconnect
 from shared.utils import normalize_doi
 
-try:
-    from azure.cosmos import CosmosClient
-except Exception:
-    CosmosClient = None
-
 try:
     import redis
 except Exception:
@@ -21,13 +17,6 @@ except Exception:
     pinecone = None
 
 
-def _load_config():
-    try:
-        return json.load(open("config.json"))
-    except Exception:
-        return {}
-
-
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """DummyStore HTTP API
 
@@ -71,20 +60,18 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         "vector": vector or [],
     }
 
-    cfg = _load_config()
+    cfg = get_config()
     results = {}
 
     # Cosmos DB
-    cosmos_cfg = cfg.get("cosmos", {})
-    if CosmosClient and cosmos_cfg.get("connection_string"):
+    container = get_cosmos_container()
+    if container is not None:
         try:
-            client = CosmosClient.from_connection_string(cosmos_cfg.get("connection_string"))
-            db = client.get_database_client(cosmos_cfg.get("database"))
-            container = db.get_container_client(cosmos_cfg.get("container"))
             container.upsert_item(item)
             results["cosmos"] = "ok"
         except Exception as e:
             logging.exception("Cosmos upsert failed")
+            reconnect(COSMOS)
             results["cosmos"] = f"error: {str(e)}"
     else:
         results["cosmos"] = "skipped"
@@ -93,9 +80,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     redis_cfg = cfg.get("redis", {})
     if redis_cfg.get("url"):
         try:
-            from shared.redis_client import get_redis_client
-
-            r = get_redis_client()
+            r = get_redis()
             if r is not None:
                 # store final object as JSON under normalized DOI key
                 r.set(key, json.dumps(item))
@@ -3,6 +3,10 @@ import sys
 import io
 import logging
 
+from shared.crawl import CrawlOptions, crawl, select_beam
+from shared.orchestration import Deadline, process_papers, race
+from shared.progress import make_status
+
 # Ensure stdout/stderr use UTF-8 so logging and prints don't fail on
 # characters outside the default Windows codepage when running locally
 try:
@@ -33,6 +37,58 @@ def _normalize_doi(doi: str) -> str:
     return doi
 
 
+# Upper bound on how many activities / sub-orchestrations are scheduled at
+# once. Can be overridden per request with `maxFanout`.
+DEFAULT_MAX_FANOUT = 16
+
+# Characters of the run token put into sub-orchestration instance IDs; keeps
+# them within the 100 character limit while still differing between runs.
+SUB_ID_TOKEN_LENGTH = 12
+
+
+class _Progress:
+    """Progress of one run.
+
+    Every report updates the instance's custom status, which costs nothing
+    and is what the Durable status API shows. Reports marked `publish` also
+    go to the Redis progress key through UpdateProgress; those activities are
+    not awaited on their own but ride along with the next piece of work
+    (`take` / `run`), so they add no extra round trips.
+    """
+
+    def __init__(self, context, doi, request_for):
+        self.context = context
+        self.doi = doi
+        self.request_for = request_for
+        self.seq = 0
+        self.last = 0
+        self.pending = []
+
+    def report(self, stage, progress=None, publish=False):
+        self.seq += 1
+        status = make_status(
+            self.doi,
+            self.request_for,
+            stage,
+            progress,
+            self.seq,
+            self.context.instance_id,
+            self.context.current_utc_datetime.isoformat(),
+        )
+        self.last = status["progress"]
+        self.context.set_custom_status(status)
+        if publish:
+            self.pending.append(self.context.call_activity('UpdateProgress', status))
+
+    def take(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+    def run(self, task, cutoff=None):
+        """Like `race(context, task, cutoff)`, dispatching pending updates alongside."""
+        return (yield from race(self.context, task, cutoff, self.take()))
+
+
 def orchestrator_function(context: df.DurableOrchestrationContext):
     input_ = context.get_input() or {}
     doi = _normalize_doi(input_.get("doi"))
@@ -40,70 +96,209 @@ def orchestrator_function(context: df.DurableOrchestrationContext):
 
     if not doi or request_for not in ("citating", "references"):
         return {"error": "Missing or invalid doi/requestFor"}
+    try:
+        max_fanout = int(input_.get("maxFanout") or DEFAULT_MAX_FANOUT)
+    except (TypeError, ValueError):
+        max_fanout = DEFAULT_MAX_FANOUT
+    # the instance ID is fixed per DOI/direction and reused by every
+    # recompute, so each execution gets its own token (new_uuid is
+    # deterministic across replays) to tell its saves apart
+    run_id = str(context.new_uuid())
+    run_started_at = context.current_utc_datetime.isoformat()
+    # "fetch" or "query"; ComputeScores falls back to config.json when unset
+    score_mode = input_.get("scoreMode")
+    fetch_opts = {"requestFor": request_for}
+    for opt in ("maxReferences", "maxCiting", "rankCiting"):
+        if input_.get(opt):
+            fetch_opts[opt] = input_.get(opt)
     print("Orchestrator started for DOI:", doi, "requestFor:", request_for)
-    # Level 0 is the input
-    level0 = [doi]
 
-    # Fetch gen1: direct children (citers or references depending on request_for)
-    gen1 = []
-    for d in level0:
-        related = yield context.call_activity('FetchRelated', {"doi": d, "requestFor": request_for})
-        gen1.extend(related or [])
-    gen1 = list(dict.fromkeys(gen1))  # dedupe preserving order
+    # metadata references and similarity scores collected so far; beam mode
+    # fills these while crawling so the final phase only does what is left
+    metadata_map = {}
+    scores = {}
+    state = {
+        "chunks": 0,
+        "runId": run_id,
+        "subId": f"{context.instance_id}:{run_id[:SUB_ID_TOKEN_LENGTH]}",
+        "version": 0,
+    }
+    # gen1 published early: the DOIs to publish, the running sub-orchestration
+    publish = {"dois": None, "task": None, "merged": False}
+    options = CrawlOptions.from_input(input_)
+    # optional wall-clock budget for the whole request; when it runs low we
+    # stop expanding and save whatever is finished as a partial result
+    deadline = Deadline(context, input_.get("deadlineSeconds"))
+    progress = _Progress(context, doi, request_for)
+    progress.report("crawling")
+
+    def _score(children):
+        # scoring may run until the hard deadline; leftovers simply stay unscored
+        finished, result = yield from progress.run(
+            context.call_activity('ComputeScores', {"parent": doi, "children": children, "mode": score_mode}),
+            deadline.cutoff(),
+        )
+        if not finished:
+            deadline.partial = True
+        scores.update(result or {})
 
-    print("Gen1 DOIs:", gen1)
-    # Fetch gen2: children of gen1
-    gen2 = []
-    for d in gen1:
-        related = yield context.call_activity('FetchRelated', {"doi": d, "requestFor": request_for})
-        gen2.extend(related or [])
-    gen2 = [x for x in dict.fromkeys(gen2) if x not in gen1 and x not in level0]
+    def _save_signature(gen1, gen2, partial):
+        wanted = set([doi] + gen1 + gen2)
+        return (tuple(gen1), tuple(gen2), partial, tuple(sorted(d for d in scores if d in wanted)))
+
+    def _save(gen1, gen2, partial):
+        # a deadline can leave the final graph exactly as published early;
+        # do not save the same document twice
+        signature = _save_signature(gen1, gen2, partial)
+        if signature == state.get("saved"):
+            return
+        state["saved"] = signature
+        # every save of this run carries (runId, runStartedAt, version) so
+        # SaveCosmosRedis can drop replays/retries and never let an older
+        # save, or a save of an older run, overwrite a newer one; only the
+        # papers in this save are sent along
+        state["version"] += 1
+        wanted = set([doi] + gen1 + gen2)
+        yield from progress.run(context.call_activity('SaveCosmosRedis', {
+            "doi": doi,
+            "requestFor": request_for,
+            "gen1": gen1,
+            "gen2": gen2,
+            "scores": {d: v for d, v in scores.items() if d in wanted},
+            "metadata_map": {d: v for d, v in metadata_map.items() if d in wanted},
+            "partial": partial,
+            "runId": run_id,
+            "runStartedAt": run_started_at,
+            "version": state["version"],
+        }))
+
+    def _on_level(level, found):
+        # crawling covers 5% -> 20% of the run
+        progress.report("crawling", 5 + int(15 * level / options.depth), publish=True)
+        # publish gen1 early so readers get a useful graph long before the
+        # deeper levels are done; it starts with the level-2 expansion (see
+        # _side) and the final save merges the rest in
+        if level == 1 and options.depth >= 2 and found:
+            publish["dois"] = found
+
+    def _start_publish():
+        children = publish["dois"]
+        wanted = set([doi] + children)
+        state["version"] += 1
+        print("Publishing", len(children), "gen1 DOIs early for DOI:", doi)
+        return context.call_sub_orchestrator('PublishLevelOrchestrator', {
+            "doi": doi,
+            "requestFor": request_for,
+            "children": children,
+            "metadata": {d: v for d, v in metadata_map.items() if d in wanted},
+            "scores": {d: v for d, v in scores.items() if d in wanted},
+            "runId": run_id,
+            "runStartedAt": run_started_at,
+            "version": state["version"],
+            "maxFanout": max_fanout,
+            "scoreMode": score_mode,
+            "deadline": deadline.to_input(),
+        }, f"{state['subId']}:publish")
+
+    def _finish_publish():
+        # the wave the publish rode along with waited for it, so it is done
+        result = publish["task"].result or {}
+        publish["merged"] = True
+        metadata_map.update(result.get("metadata") or {})
+        for d, v in (result.get("scores") or {}).items():
+            scores.setdefault(d, v)
+        saved = result.get("saved") or []
+        if saved:
+            state["saved"] = _save_signature(saved, [], True)
+            progress.report("published", progress.last, publish=True)
 
+    def _side():
+        # extra tasks for every crawl wave: pending progress updates, and the
+        # gen1 publish on the first level-2 wave; it runs next to the
+        # expansion instead of in front of it and, being a side task, is not
+        # raced against the expansion budget
+        if publish["task"] is not None and not publish["merged"]:
+            _finish_publish()
+        tasks = progress.take()
+        if publish["dois"] and publish["task"] is None:
+            publish["task"] = _start_publish()
+            tasks.append(publish["task"])
+        return tasks
+
+    def _beam_select(level, found):
+        # embed this level (and the root) now so it can be scored against
+        # the root, then expand only the most similar DOIs
+        yield from process_papers(
+            context, [doi] + found, metadata_map, state, max_fanout, progress, deadline, report=False
+        )
+        unscored = [d for d in found if d not in scores]
+        if unscored:
+            yield from _score(unscored)
+        return select_beam(found, scores, options.beam_width, options.beam_threshold)
+
+    # Level 0 is the input; crawl expands `depth` levels below it (default 2:
+    # gen1 = direct citers/references, gen2 = their children) within the
+    # per-level, node and time budgets from the request.
+    levels = yield from crawl(
+        context,
+        doi,
+        fetch_opts,
+        options,
+        max_fanout,
+        select_frontier=_beam_select if options.beam else None,
+        deadline=deadline,
+        on_level=_on_level,
+        side=_side,
+    )
+    # without a level-2 wave to ride along with, the publish never started;
+    # the final save below covers it
+    if publish["task"] is not None and not publish["merged"]:
+        _finish_publish()
+    level0 = levels[0]
+    gen1 = levels[1] if len(levels) > 1 else []
+    # everything deeper than gen1 is stored as gen2 children
+    gen2 = [x for lvl in levels[2:] for x in lvl]
+
+    print("Gen1 DOIs:", gen1)
     print("Gen2 DOIs:", gen2)
 
     # Combine all DOIs to process embeddings and metadata
     all_dois = list(dict.fromkeys(level0 + gen1 + gen2))
     print(all_dois)
 
-    total = len(all_dois)
-    processed = 0
-    thresholds = [20, 40, 60, 80]
+    # stage boundaries are published to the progress key; the update goes
+    # out together with the stage's first piece of work
+    progress.report("processing", publish=True)
 
-    # set initial progress to 20%
-    yield context.call_activity('UpdateProgress', {"doi": doi, "progress": 20})
+    yield from process_papers(context, all_dois, metadata_map, state, max_fanout, progress, deadline)
+    if deadline.partial:
+        # only keep the papers that made it through processing
+        gen1 = [d for d in gen1 if d in metadata_map]
+        gen2 = [d for d in gen2 if d in metadata_map]
 
-    # For each DOI: fetch metadata -> compute embeddings -> upsert pinecone
-    # Collect metadata and vectors into maps so SaveCosmosRedis can use them
-    metadata_map = {}
-    # vectors_map = {}
-    for d in all_dois:
-        meta = yield context.call_activity('GetMetadata', d)
-        abstract = (meta or {}).get('abstract') or ""
-        print("Abstract extracted:",abstract)
-        # compute embeddings (may use Pinecone integrated embeddings or fallback)
-
-        # upsert into pinecone including vector and cleaned metadata
-        yield context.call_activity('UpsertPinecone', {"doi": d, "abstract": abstract, "metadata": meta})
-
-        metadata_map[d] = meta or {}
-        # vectors_map[d] = vector or []
-
-        processed += 1
-        pct = int(processed / total * 100)
-        # update progress at thresholds 20,40,60,80
-        while thresholds and pct >= thresholds[0]:
-            t = thresholds.pop(0)
-            print("Updating progress to", t, "% for DOI:", doi)
-            yield context.call_activity('UpdateProgress', {"doi": doi, "progress": t})
-
-    # After upserts, compute similarity scores via Pinecone
+    # After upserts, compute similarity scores via Pinecone (beam mode has
+    # already scored the levels it used for selection)
     children = [d for d in (gen1 + gen2) if d != doi]
-    scores = yield context.call_activity('ComputeScores', {"parent": doi, "children": children})
+    unscored = [d for d in children if d not in scores]
+    if unscored and not deadline.passed():
+        progress.report("scoring", publish=True)
+        yield from _score(unscored)
+    elif unscored:
+        deadline.partial = True
 
     # Save assembled results into Cosmos then Redis for the input DOI (include scores)
     # Pass collected metadata and vectors to SaveCosmosRedis to avoid re-querying OpenAlex
-    yield context.call_activity('SaveCosmosRedis', {"doi": doi, "requestFor": request_for, "gen1": gen1, "gen2": gen2, "scores": scores, "metadata_map": metadata_map})
+    # (a partial save is marked as such so it is never served as complete)
+    progress.report("saving")
+    yield from _save(gen1, gen2, deadline.partial)
+
+    # the only progress update that waits on its own: it must land after the save
+    progress.report("partial" if deadline.partial else "done", publish=True)
+    yield context.task_all(progress.take())
 
+    if deadline.partial:
+        print("Deadline reached for DOI:", doi, "- saved a partial result")
+        return {"status": "partial", "processed": len(metadata_map)}
     return {"status": "started", "processed": len(all_dois)}
 
 
@@ -1,11 +1,71 @@
+import asyncio
+import json
+import logging
+
 import azure.functions as func
 import azure.durable_functions as df
 
+from shared.progress import make_status, publish_progress
+from shared.result_cache import default_max_age, get_cached_result
+from shared.utils import orchestration_instance_id
+
+# Optional request fields passed through to DurableComputationOrchestrator
+OPTIONAL_FIELDS = (
+    "maxFanout",
+    "maxReferences",
+    "maxCiting",
+    "rankCiting",
+    "depth",
+    "maxFrontier",
+    "maxNodes",
+    "timeBudgetSeconds",
+    "beamWidth",
+    "beamThreshold",
+    "deadlineSeconds",
+    "scoreMode",
+)
+
+# Runtime states in which an instance still owns its ID
+NON_TERMINAL_STATES = ("Pending", "Running", "ContinuedAsNew", "Suspended")
+
+# After terminating for a forced refresh, how long to wait for the old run
+# to release its instance ID before giving up.
+FORCE_START_ATTEMPTS = 10
+FORCE_START_DELAY = 0.5
+
+
+async def _is_running(client: df.DurableOrchestrationClient, instance_id: str) -> bool:
+    try:
+        status = await client.get_status(instance_id)
+    except Exception:
+        return False
+    runtime_status = getattr(status, "runtime_status", None)
+    return getattr(runtime_status, "name", runtime_status) in NON_TERMINAL_STATES
+
 
 async def main(req: func.HttpRequest, starter: str) -> func.HttpResponse:
     """HTTP starter that kicks off the DurableComputation orchestrator.
 
     Expects JSON body or query params: { "doi": "...", "requestFor": "citating"|"references" }
+    Optional: "maxFanout" caps how many activities run in parallel and
+    "maxReferences" caps how many references are resolved per paper,
+    "maxCiting" caps citing works per paper and "rankCiting" keeps the
+    most-cited ones when that cap applies. Crawl size is bounded with
+    "depth" (levels below the DOI, default 2), "maxFrontier" (new DOIs per
+    level), "maxNodes" (whole graph) and "timeBudgetSeconds". "beamWidth"
+    and/or "beamThreshold" expand only the top-K / sufficiently similar
+    DOIs of each level. "scoreMode" ("fetch" or "query") picks how
+    similarity scores are computed.
+
+    If Redis or Cosmos already holds a document with this direction computed
+    within "maxAge" seconds (default from config.json), it is returned
+    directly with a 200 and no orchestration is started.
+
+    Instance IDs are derived from the DOI and direction, so a request for a
+    paper that is already being computed returns the running instance's
+    status URLs. Pass "force": true to skip the cache, terminate any running
+    instance and start over. Progress can be polled cheaply through
+    ProgressStatus.
     """
     try:
         body = req.get_json()
@@ -13,11 +73,62 @@ async def main(req: func.HttpRequest, starter: str) -> func.HttpResponse:
         body = None
 
     doi = (body or {}).get("doi") or req.params.get("doi")
-    request_for = (body or {}).get("requestFor") or req.params.get("requestFor")
+    request_for = str((body or {}).get("requestFor") or req.params.get("requestFor") or "").lower()
 
     if not doi or not request_for:
         return func.HttpResponse("Missing 'doi' or 'requestFor'", status_code=400)
+    # also keeps arbitrary text out of the instance ID
+    if request_for not in ("citating", "references"):
+        return func.HttpResponse("'requestFor' must be 'citating' or 'references'", status_code=400)
+
+    payload = {"doi": doi, "requestFor": request_for}
+    # optional tuning knobs forwarded to the orchestrator as-is
+    for field in OPTIONAL_FIELDS:
+        value = (body or {}).get(field) or req.params.get(field)
+        if value:
+            payload[field] = value
+
+    force = str((body or {}).get("force") or req.params.get("force") or "").lower() in ("1", "true", "yes")
 
+    # Fast path: serve a fresh, already-computed document without starting
+    # an orchestration at all.
+    if not force:
+        try:
+            max_age = int((body or {}).get("maxAge") or req.params.get("maxAge") or default_max_age())
+        except (TypeError, ValueError):
+            max_age = default_max_age()
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, get_cached_result, doi, request_for, max_age)
+        if cached is not None:
+            return func.HttpResponse(
+                json.dumps(cached), mimetype="application/json", headers={"X-Graphi-Cache": "hit"}
+            )
+
+    # One orchestration per DOI/direction: repeat requests join the running
+    # instance instead of starting an identical crawl.
     client = df.DurableOrchestrationClient(starter)
-    instance_id = await client.start_new('DurableComputationOrchestrator', None, {"doi": doi, "requestFor": request_for})
-    return client.create_check_status_response(req, instance_id)
+    instance_id = orchestration_instance_id(doi, request_for)
+    running = await _is_running(client, instance_id)
+    if running and not force:
+        return client.create_check_status_response(req, instance_id)
+    if running:
+        await client.terminate(instance_id, "Superseded by a forced refresh")
+
+    attempts = FORCE_START_ATTEMPTS if running else 1
+    for attempt in range(attempts):
+        try:
+            await client.start_new('DurableComputationOrchestrator', instance_id, payload)
+            # reset the progress key so pollers never see a previous run's status
+            queued = make_status(doi, request_for, "queued", instance_id=instance_id)
+            await asyncio.get_running_loop().run_in_executor(None, publish_progress, queued)
+            return client.create_check_status_response(req, instance_id)
+        except Exception:
+            if not running and await _is_running(client, instance_id):
+                # another starter won the race: join its run
+                return client.create_check_status_response(req, instance_id)
+            if attempt + 1 < attempts:
+                # the terminated run has not released its instance ID yet
+                await asyncio.sleep(FORCE_START_DELAY)
+
+    logging.error("Could not start orchestration %s", instance_id)
+    return func.HttpResponse("Could not start computation for this DOI; retry shortly", status_code=409)
@@ -1,13 +1,98 @@
-import requests
 import json
-from typing import List
+from itertools import islice
+from typing import Iterator, List
 
-def _openalex_get(url: str, params=None):
-    headers = {}
-    resp = requests.get(url, params=params, headers=headers, timeout=30)
-    # print("Returned", url, resp.json())
-    resp.raise_for_status()
-    return resp.json()
+from shared.identity_map import lookup_dois, lookup_wids, record_works, short_id
+from shared.metadata import simplify_work
+from shared.openalex import get_openalex_client
+from shared.paper_store import get_papers, put_papers
+
+
+def _openalex_get(path: str, params=None):
+    # pooled session with retries, Retry-After handling and rate limiting
+    return get_openalex_client().get_json(path, params=params)
+
+
+# OpenAlex accepts up to 50 OR-ed values in a filter (and 50 fits one page)
+ID_BATCH_SIZE = 50
+
+
+def _resolve_id_chunk(ids: List[str]) -> dict:
+    """Resolve up to ID_BATCH_SIZE OpenAlex work IDs with a single query.
+
+    Returns a mapping short OpenAlex ID -> DOI (None for works without one).
+    """
+    params = {
+        "filter": "openalex_id:" + "|".join(ids),
+        "per_page": ID_BATCH_SIZE,
+        "select": "id,doi",
+    }
+    r = _openalex_get("/works", params=params)
+    items = r.get("results", []) or []
+    record_works(items)
+    return {short_id(item.get("id")): item.get("doi") for item in items if item.get("id")}
+
+
+def _resolve_openalex_ids(refs: List[str]) -> List[str]:
+    """Resolve OpenAlex work references to DOIs, preserving input order.
+
+    The identity map answers most IDs without any request; the rest are
+    grouped into `filter=openalex_id:W1|W2|...` queries and the chunks are
+    fetched concurrently. Works without a DOI are dropped.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    ids = list(dict.fromkeys(short_id(r) for r in refs if r))
+    resolved = lookup_dois(ids)
+    pending = [i for i in ids if i not in resolved]
+    chunks = [pending[i:i + ID_BATCH_SIZE] for i in range(0, len(pending), ID_BATCH_SIZE)]
+    if not chunks:
+        return [resolved[i] for i in ids if resolved.get(i)]
+
+    def _safe_resolve(chunk):
+        try:
+            return _resolve_id_chunk(chunk)
+        except Exception:
+            # a failed chunk only loses its own references
+            return {}
+
+    with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as ex:
+        for part in ex.map(_safe_resolve, chunks):
+            resolved.update(part)
+    return [resolved[i] for i in ids if resolved.get(i)]
+
+
+# Cursor paging allows up to 200 results per page; we only need a few fields.
+CITING_PAGE_SIZE = 200
+CITING_FIELDS = "doi,id,cited_by_count"
+DEFAULT_MAX_CITING = 200
+
+
+def iter_citing_works(openalex_id: str, per_page: int = CITING_PAGE_SIZE, sort_by_citations: bool = False) -> Iterator[dict]:
+    """Yield works citing `openalex_id`, one page at a time.
+
+    Uses OpenAlex cursor paging with field projection so each item only
+    carries `doi`, `id` and `cited_by_count`. With `sort_by_citations` the
+    most-cited citers come first, so stopping early keeps the best ones.
+    Callers can stop iterating at any point and no further pages are fetched.
+    """
+    cursor = "*"
+    while cursor:
+        params = {
+            "filter": f"cites:{openalex_id}",
+            "per_page": per_page,
+            "cursor": cursor,
+            "select": CITING_FIELDS,
+        }
+        if sort_by_citations:
+            params["sort"] = "cited_by_count:desc"
+        r = _openalex_get("/works", params=params)
+        items = r.get("results", []) or []
+        record_works(items)
+        yield from items
+        if len(items) < per_page:
+            break
+        cursor = (r.get("meta") or {}).get("next_cursor")
 
 
 def main(params: dict) -> List[str]:
@@ -20,90 +105,63 @@ def main(params: dict) -> List[str]:
     if not doi or request_for not in ("citating", "references"):
         return []
 
-    # query the OpenAlex work by DOI
-    work_url = f"https://api.openalex.org/works/https://doi.org/{doi}"
-    print("Fetching related works for DOI:", doi, "requestFor:", work_url)
-    try:
-        w = _openalex_get(work_url)
-    except Exception:
+    # skip DOIs the shared paper store already knows OpenAlex does not have
+    _, missing = get_papers([doi])
+    if doi in missing:
         return []
 
+    # The citing crawl only needs the OpenAlex ID, which the identity map
+    # usually knows; the references path needs the full work JSON.
+    openalex_id = lookup_wids([doi]).get(doi) if request_for == "citating" else None
+    w = {}
+    if not openalex_id:
+        # query the OpenAlex work by DOI
+        print("Fetching related works for DOI:", doi, "requestFor:", request_for)
+        try:
+            w = get_openalex_client().get_work_by_doi(doi)
+        except Exception:
+            return []
+        if not w:
+            put_papers({}, missing=[doi])
+            return []
+        record_works([w])
+        # we already hold the full work JSON; share it so GetMetadata can skip it
+        put_papers({doi: simplify_work(w, doi)})
+        openalex_id = w.get("id")
+
     results = []
 
     # For references: the work contains 'referenced_works' (OpenAlex IDs)
     if request_for == "references":
         refs = w.get("referenced_works", []) or []
-        print("Found referenced works:", refs)
-        # resolve a handful of referenced works to DOIs
-        # OpenAlex returns referenced_works as OpenAlex work URLs/IDs. We need
-        # to fetch each work and extract its 'doi' field. To speed this up we
-        # resolve them concurrently with a small pool.
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-
-        def _resolve_openalex_to_doi(rid: str):
-            # Convert an OpenAlex work reference (could be a webpage URL or ID)
-            # into an API call to fetch the work JSON and extract its DOI.
+        print("Found referenced works:", len(refs))
+        # OpenAlex returns referenced_works as OpenAlex work URLs/IDs. Resolve
+        # them to DOIs in bulk (50 IDs per request) instead of one GET each.
+        max_refs = params.get("maxReferences")
+        if max_refs:
             try:
-                # normalize id: accept forms like 'https://openalex.org/W123' or 'W123'
-                oid = rid
-                if isinstance(rid, str) and "openalex.org" in rid:
-                    oid = rid.rstrip("/\n \t").split("/")[-1]
-
-                api_url = f"https://api.openalex.org/works/{oid}"
-
-                # small retry (2 attempts)
-                for attempt in range(2):
-                    try:
-                        resp = _openalex_get(api_url)
-                        # DOI may be available in resp['ids']['doi'] or top-level 'doi'
-                        doi_val = None
-                        ids = resp.get("ids") or {}
-                        doi_val = ids.get("doi") or resp.get("doi")
-                        if doi_val:
-                            return doi_val
-                        # no DOI present for this work
-                        return None
-                    except Exception:
-                        # small backoff
-                        import time
-
-                        time.sleep(0.2 + 0.2 * attempt)
-                        continue
-            except Exception:
-                return None
-
-        # limit how many references we resolve to a reasonable count
-        to_resolve = refs[:10]
-        with ThreadPoolExecutor(max_workers=8) as ex:
-            futures = {ex.submit(_resolve_openalex_to_doi, rid): rid for rid in to_resolve}
-            for fut in as_completed(futures):
-                try:
-                    doi_r = fut.result()
-                    if doi_r:
-                        results.append(doi_r)
-                except Exception:
-                    # individual failures are expected; continue
-                    continue
+                refs = refs[: int(max_refs)]
+            except (TypeError, ValueError):
+                pass
+        results.extend(_resolve_openalex_ids(refs))
 
     else:
         # For citating: query works that cite this work using OpenAlex filter
-        openalex_id = w.get("id")
         if openalex_id:
-            # OpenAlex supports filter=cites:OPENALEX_ID
             try:
-                page = 1
-                per_page = 50
-                while True:
-                    params = {"filter": f"cites:{openalex_id}", "per_page": per_page, "page": page}
-                    r = _openalex_get(f"https://api.openalex.org/works", params=params)
-                    for item in r.get("results", []):
-                        doi_r = item.get("doi")
-                        if doi_r:
-                            results.append(doi_r)
-                    # stop if fewer than per_page or we collected enough
-                    if len(r.get("results", [])) < per_page or len(results) >= 200:
-                        break
-                    page += 1
+                max_citing = int(params.get("maxCiting") or DEFAULT_MAX_CITING)
+            except (TypeError, ValueError):
+                max_citing = DEFAULT_MAX_CITING
+            by_citations = str(params.get("rankCiting") or "").lower() in ("1", "true", "yes")
+            try:
+                # the generator is lazy: islice stops paging once we have enough
+                citing = iter_citing_works(
+                    short_id(openalex_id),
+                    per_page=min(CITING_PAGE_SIZE, max_citing),
+                    sort_by_citations=by_citations,
+                )
+                dois = (item.get("doi") for item in citing if item.get("doi"))
+                results.extend(islice(dois, max_citing))
             except Exception:
                 pass
 
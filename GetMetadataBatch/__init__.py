@@ -0,0 +1,119 @@
+import logging
+from typing import Dict, List, Optional
+
+from shared.fingerprints import unchanged
+from shared.identity_map import record_works
+from shared.metadata import bare_doi, simplify_work
+from shared.openalex import get_openalex_client
+from shared.paper_store import get_papers, put_papers
+from shared.staging import stage_many
+
+# OpenAlex accepts up to 50 OR-ed values per filter
+BATCH_SIZE = 50
+# One DOI can match several works, so a chunk may have more than BATCH_SIZE
+# results: ask for OpenAlex's largest page and keep paging up to meta.count
+PAGE_SIZE = 200
+MAX_PAGES = 10
+
+
+def _fetch_single(doi: str) -> Optional[dict]:
+    """Fetch one DOI; returns None when OpenAlex has no such work."""
+    w = get_openalex_client().get_work_by_doi(doi)
+    if w:
+        record_works([w])
+    return simplify_work(w, doi) if w else None
+
+
+def _fetch_chunk(dois: List[str]) -> Dict[str, dict]:
+    """Resolve up to BATCH_SIZE DOIs with a single `filter=doi:a|b|c` query."""
+    # OpenAlex returns DOIs as lowercase https://doi.org/ URLs; match on the
+    # bare lowercase form and map back to the caller's original string.
+    wanted = {bare_doi(d).lower(): d for d in dois}
+    params = {
+        "filter": "doi:" + "|".join(wanted.keys()),
+        "per_page": PAGE_SIZE,
+    }
+    results = []
+    for page in range(1, MAX_PAGES + 1):
+        r = get_openalex_client().get_json("/works", params=dict(params, page=page))
+        batch = r.get("results") or []
+        results.extend(batch)
+        if not batch or len(results) >= int((r.get("meta") or {}).get("count") or 0):
+            break
+    record_works(results)
+
+    out = {}
+    for w in results:
+        original = wanted.get(bare_doi(w.get("doi") or "").lower())
+        if original and original not in out:
+            out[original] = simplify_work(w, original)
+    return out
+
+
+def main(dois) -> Dict[str, dict]:
+    """Fetch metadata for many DOIs at once.
+
+    `dois` is either a list of DOIs or `{"dois": [...], "runId": <id>}`.
+    Returns a DOI -> metadata map where every value has the same shape that
+    `GetMetadata.main` returns. DOIs OpenAlex does not know map to `{}`.
+
+    With a `runId`, metadata is staged (see `shared.staging`) and the map
+    holds small `{"$ref": ...}` references instead, keeping abstracts out of
+    orchestration history.
+
+    With `"checkEmbedded": true` the result is
+    `{"metadata": <map>, "unchanged": [...]}`, listing the DOIs whose
+    Pinecone record already matches this metadata (see
+    `shared.fingerprints`) so the caller can skip upserting them.
+    """
+    run_id = None
+    check_embedded = False
+    if isinstance(dois, dict):
+        run_id = dois.get("runId")
+        check_embedded = bool(dois.get("checkEmbedded"))
+        dois = dois.get("dois")
+    dois = [d for d in dict.fromkeys(dois or []) if d]
+    result = {d: {} for d in dois}
+
+    # shared paper store first: one MGET for the whole batch
+    cached, missing = get_papers(dois)
+    result.update(cached)
+    todo = [d for d in dois if d not in cached and d not in missing]
+
+    # DOIs containing the filter separators cannot be OR-ed together safely
+    batchable = [d for d in todo if "|" not in d and "," not in d]
+    singles = [d for d in todo if "|" in d or "," in d]
+
+    fetched, not_found = {}, set()
+    for start in range(0, len(batchable), BATCH_SIZE):
+        chunk = batchable[start:start + BATCH_SIZE]
+        try:
+            got = _fetch_chunk(chunk)
+        except Exception:
+            logging.exception("Batch metadata lookup failed; falling back to single lookups")
+            singles.extend(chunk)
+            continue
+        fetched.update(got)
+        # a DOI missing from a batch response may just not have matched
+        # (e.g. DOI spelling); only a single lookup's 404 is trusted for the
+        # negative paper-store entry
+        singles.extend(d for d in chunk if d not in got)
+
+    for d in singles:
+        try:
+            meta = _fetch_single(d)
+        except Exception:
+            continue
+        if meta:
+            fetched[d] = meta
+        else:
+            not_found.add(d)
+
+    result.update(fetched)
+    put_papers(fetched, missing=not_found)
+    same = unchanged(result) if check_embedded else set()
+    if run_id:
+        result = stage_many(run_id, result)
+    if check_embedded:
+        return {"metadata": result, "unchanged": [d for d in dois if d in same]}
+    return result
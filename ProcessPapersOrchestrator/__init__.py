@@ -0,0 +1,45 @@
+import azure.durable_functions as df
+
+from shared.orchestration import fan_out
+
+# UpsertPinecone calls in flight at once inside one chunk
+DEFAULT_MAX_FANOUT = 16
+
+
+def orchestrator_function(context: df.DurableOrchestrationContext):
+    """Process one chunk of DOIs for DurableComputationOrchestrator.
+
+    input: { "dois": [...], "runId": <parent run token>, "maxFanout": <n> }
+    returns: { doi: <staged metadata reference or inline metadata> }
+
+    Running each chunk (at most METADATA_BATCH_SIZE DOIs) as its own
+    sub-orchestration keeps every instance's history small and bounded, so
+    replay cost no longer grows with the size of the whole graph.
+    """
+    input_ = context.get_input() or {}
+    dois = input_.get("dois") or []
+    run_id = input_.get("runId") or context.instance_id
+    max_fanout = input_.get("maxFanout") or DEFAULT_MAX_FANOUT
+    if not dois:
+        return {}
+
+    # one OpenAlex round trip for the whole chunk; metadata comes back as
+    # small claim-check references (see shared.staging), together with the
+    # DOIs whose Pinecone record is already up to date
+    batch = yield context.call_activity('GetMetadataBatch', {"dois": dois, "runId": run_id, "checkEmbedded": True})
+    batch = batch or {}
+    metadata_map = batch.get("metadata") or {}
+    unchanged = set(batch.get("unchanged") or [])
+
+    # upsert into pinecone including vector and cleaned metadata; the
+    # activity resolves the staged metadata (and abstract) itself. Papers
+    # embedded earlier with the same content are skipped, so overlapping
+    # crawls only pay for what is new.
+    todo = [d for d in dois if d not in unchanged]
+    yield from fan_out(
+        context, 'UpsertPinecone', [{"doi": d, "metadata": metadata_map.get(d) or {}} for d in todo], max_fanout
+    )
+    return {d: metadata_map.get(d) or {} for d in dois}
+
+
+main = df.Orchestrator.create(orchestrator_function)
@@ -0,0 +1,23 @@
+import json
+
+import azure.functions as func
+
+from shared.progress import get_progress
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """Lightweight progress lookup: GET ?doi=...&requestFor=citating|references
+
+    Reads the `progress:<requestFor>:<doi>` key written by the starter and
+    UpdateProgress; a single Redis GET, no Durable status API call. Returns
+    404 when no run has reported progress recently.
+    """
+    doi = req.params.get("doi")
+    request_for = (req.params.get("requestFor") or "").lower()
+    if not doi or request_for not in ("citating", "references"):
+        return func.HttpResponse("Missing 'doi' or 'requestFor'", status_code=400)
+
+    status = get_progress(doi, request_for)
+    if status is None:
+        return func.HttpResponse("No progress recorded for this DOI", status_code=404)
+    return func.HttpResponse(json.dumps(status), mimetype="application/json", headers={"Cache-Control": "no-store"})
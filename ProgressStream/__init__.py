@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import azure.functions as func
+
+from shared.progress import TERMINAL_STAGES, get_progress, watch_progress
+from shared.result_cache import get_stored_result
+
+# How long one request waits for events. The handler is async, so waiting
+# costs no worker thread. Python functions cannot hold a response open and
+# stream it, so each request is a long-poll window that
+# returns as soon as there is something to send (plus `LINGER_SECONDS` to
+# pick up updates right behind it) as one text/event-stream body;
+# EventSource reconnects after `RETRY_MS` and resumes from Last-Event-ID.
+DEFAULT_WINDOW_SECONDS = 25
+MAX_WINDOW_SECONDS = 60
+LINGER_SECONDS = 0.25
+RETRY_MS = 1000
+
+# stages after which the stored document has changed
+RESULT_STAGES = ("published",) + TERMINAL_STAGES
+
+
+def _event(event: str, data: dict, event_id=None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data))
+    return "\n".join(lines) + "\n\n"
+
+
+def _int_or_none(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """Server-sent progress events: GET ?doi=...&requestFor=...[&instanceId=...][&window=25]
+
+    Waits up to `window` seconds for the first event and returns shortly
+    after it. Events are named after the run's stages (queued, crawling, processing,
+    published, scoring, saving, done, partial) and carry the progress status
+    as data; the status `seq` is the event id. After "published" (gen1 is
+    saved) and the terminal stages a "result" event with the stored
+    document follows. Responds 204 once the run is finished and every event
+    has been seen, which tells EventSource to stop reconnecting.
+    """
+    doi = req.params.get("doi")
+    request_for = (req.params.get("requestFor") or "").lower()
+    if not doi or request_for not in ("citating", "references"):
+        return func.HttpResponse("Missing 'doi' or 'requestFor'", status_code=400)
+    instance_id = req.params.get("instanceId")
+    last_seq = _int_or_none(req.headers.get("Last-Event-ID") or req.params.get("lastEventId"))
+    window = _int_or_none(req.params.get("window")) or DEFAULT_WINDOW_SECONDS
+    window = max(1, min(MAX_WINDOW_SECONDS, window))
+
+    loop = asyncio.get_running_loop()
+    chunks = [f"retry: {RETRY_MS}\n\n"]
+    sent = 0
+    async for status in watch_progress(doi, request_for, last_seq, timeout=window, linger=LINGER_SECONDS):
+        if instance_id and status.get("instanceId") not in (None, instance_id):
+            continue
+        stage = status.get("stage") or "progress"
+        chunks.append(_event(stage, status, status.get("seq")))
+        sent += 1
+        if stage in RESULT_STAGES:
+            doc = await loop.run_in_executor(None, get_stored_result, doi)
+            if doc is not None:
+                chunks.append(_event("result", doc))
+
+    if not sent:
+        latest = await loop.run_in_executor(None, get_progress, doi, request_for)
+        if latest is not None and latest.get("stage") in TERMINAL_STAGES and last_seq == latest.get("seq"):
+            return func.HttpResponse(status_code=204)
+
+    return func.HttpResponse(
+        "".join(chunks),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
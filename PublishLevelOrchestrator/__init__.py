@@ -0,0 +1,68 @@
+import azure.durable_functions as df
+
+from shared.orchestration import Deadline, process_papers, race
+
+# ProcessPapersOrchestrator chunks in flight at once
+DEFAULT_MAX_FANOUT = 16
+
+
+def orchestrator_function(context: df.DurableOrchestrationContext):
+    """Publish one crawled level early for DurableComputationOrchestrator.
+
+    input: { "doi", "requestFor", "children": [...], "metadata": {doi: ref},
+             "scores": {doi: score}, "runId", "runStartedAt", "version",
+             "maxFanout", "scoreMode", "deadline": <Deadline.to_input()> }
+    returns: { "metadata": {...}, "scores": {...}, "saved": [...] }
+
+    Processes and scores the children not covered by `metadata` / `scores`
+    and saves them as a partial result. Running this as one
+    sub-orchestration lets the parent schedule it next to the following
+    level's expansion instead of in front of it. The parent reuses the
+    returned metadata references and scores; `saved` lists the children in
+    the saved document (empty when nothing was saved).
+    """
+    input_ = context.get_input() or {}
+    doi = input_.get("doi")
+    children = input_.get("children") or []
+    run_id = input_.get("runId") or context.instance_id
+    max_fanout = input_.get("maxFanout") or DEFAULT_MAX_FANOUT
+    metadata_map = dict(input_.get("metadata") or {})
+    scores = dict(input_.get("scores") or {})
+    deadline = Deadline.from_input(context, input_.get("deadline"))
+    if not doi or not children:
+        return {"metadata": metadata_map, "scores": scores, "saved": []}
+
+    state = {"chunks": 0, "runId": run_id, "subId": context.instance_id}
+    yield from process_papers(context, [doi] + children, metadata_map, state, max_fanout, deadline=deadline)
+
+    ready = [d for d in children if d in metadata_map]
+    unscored = [d for d in ready if d not in scores]
+    if unscored and not deadline.passed():
+        _, result = yield from race(
+            context,
+            context.call_activity(
+                'ComputeScores', {"parent": doi, "children": unscored, "mode": input_.get("scoreMode")}
+            ),
+            deadline.cutoff(),
+        )
+        scores.update(result or {})
+    if not ready:
+        return {"metadata": metadata_map, "scores": scores, "saved": []}
+
+    wanted = set([doi] + ready)
+    yield context.call_activity('SaveCosmosRedis', {
+        "doi": doi,
+        "requestFor": input_.get("requestFor"),
+        "gen1": ready,
+        "gen2": [],
+        "scores": {d: v for d, v in scores.items() if d in wanted},
+        "metadata_map": {d: v for d, v in metadata_map.items() if d in wanted},
+        "partial": True,
+        "runId": run_id,
+        "runStartedAt": input_.get("runStartedAt"),
+        "version": input_.get("version"),
+    })
+    return {"metadata": metadata_map, "scores": scores, "saved": ready}
+
+
+main = df.Orchestrator.create(orchestrator_function)
@@ -1,102 +1,52 @@
 import json
 import logging
-import requests
-
-try:
-    from azure.cosmos import CosmosClient
-except Exception:
-    CosmosClient = None
+from datetime import datetime, timezone
 
+from shared.clients import COSMOS, config_section, get_cosmos_container, get_redis, reconnect
 from shared.utils import normalize_doi
-from shared.pinecone_client import get_pinecone_index
-
-
-def _load_config():
-    try:
-        return json.load(open("config.json"))
-    except Exception:
-        return {}
+from shared.identity_map import record_works
+from shared.metadata import simplify_work
+from shared.openalex import get_openalex_client
+from shared.paper_store import get_papers, put_papers
+from shared.pinecone_client import fetch_vectors, get_pinecone_index
+from shared.result_cache import COMPUTED_AT_FIELDS, COMPUTED_FLAGS, PARTIAL_FIELDS
+from shared.staging import resolve_many
 
 
 def _fetch_metadata(doi: str) -> dict:
     if not doi:
         return {}
     try:
-        resp = requests.get(f"https://api.openalex.org/works/https://doi.org/{doi}", timeout=20)
-        w = resp.json()
+        w = get_openalex_client().get_work_by_doi(doi)
     except Exception:
         return {}
+    if w:
+        record_works([w])
 
-    title = w.get("title")
-    authors = [a.get("author", {}).get("display_name") for a in w.get("authorships", []) if a.get("author")]
-    year = w.get("publication_year")
-    venue = (w.get("host_venue") or {}).get("display_name")
-    citations = w.get("cited_by_count") or 0
-    references = len(w.get("referenced_works", []) or [])
-
-    # reconstruct abstract like GetMetadata
-    abstract = ""
-    try:
-        inv = w.get("abstract_inverted_index")
-        if inv and isinstance(inv, dict):
-            max_pos = -1
-            for positions in inv.values():
-                for p in positions or []:
-                    try:
-                        pi = int(p)
-                        if pi > max_pos:
-                            max_pos = pi
-                    except Exception:
-                        continue
-            if max_pos >= 0:
-                tokens = [""] * (max_pos + 1)
-                for word, positions in inv.items():
-                    for p in positions or []:
-                        try:
-                            pi = int(p)
-                            if 0 <= pi < len(tokens):
-                                tokens[pi] = word
-                        except Exception:
-                            continue
-                abstract = " ".join(tokens).split()
-                abstract = " ".join(abstract)
-        if not abstract:
-            abstract = w.get("abstract") or ""
-    except Exception:
-        abstract = w.get("abstract") or ""
-
-    keywords = [c.get("display_name") for c in w.get("concepts", [])][:10]
-
-    return {
-        "id": doi,
-        "title": title,
-        "authors": [a for a in authors if a],
-        "year": year,
-        "venue": venue,
-        "doi": doi,
-        "citations": citations,
-        "references": references,
-        "keywords": keywords,
-        "abstract": abstract,
-        "citating": w.get("cited_by_count", 0),
-        "referenced_works": w.get("referenced_works_count", 0),
-    }
+    meta = simplify_work(w, doi)
+    if meta:
+        meta["citations"] = meta.get("citations") or 0
+    return meta
 
 
 def _fetch_vectors(index, ids: list) -> dict:
     """Fetch vectors from Pinecone index for a list of normalized ids.
-    Returns mapping id -> vector (or empty list).
+    Returns mapping id -> vector; ids missing from the index are left out.
     """
-    out = {}
     if not index or not ids:
-        return out
-    try:
-        res = index.fetch(ids=ids, namespace="my-namespace")
-        # vectors = resp.get("vectors", {})
-        for _id in ids:
-            out[_id]=res.vectors[_id].values
-    except Exception:
-        logging.exception("Failed to fetch vectors from Pinecone")
+        return {}
+    matrix, rows = fetch_vectors(index, ids)
+    return {_id: [float(x) for x in matrix[row]] for _id, row in rows.items()}
+
+
+def _union_children(old: list, new: list) -> list:
+    """Merge two child lists by DOI; entries from `new` win, order is kept."""
+    fresh = {c.get("doi"): c for c in new or [] if isinstance(c, dict)}
+    out = []
+    for c in old or []:
+        d = c.get("doi") if isinstance(c, dict) else None
+        out.append(fresh.pop(d, c))
+    out.extend(fresh.values())
     return out
 
 
@@ -106,8 +56,8 @@ def main(params: dict):
     gen1 = params.get("gen1") or []
     gen2 = params.get("gen2") or []
     scores = params.get("scores") or {}
-
-    cfg = _load_config()
+    # the orchestrator hit its deadline and this graph is incomplete
+    partial = bool(params.get("partial"))
 
     # Build list of children depending on request_for
     children = [d for d in (gen1 + gen2) if d]
@@ -117,16 +67,24 @@ def main(params: dict):
 
     # Use provided metadata_map and vectors_map if the orchestrator passed them
     meta_map = params.get("metadata_map") if isinstance(params.get("metadata_map"), dict) else None
+    if meta_map is not None:
+        # values may be claim-check references staged by GetMetadataBatch
+        meta_map = resolve_many(meta_map)
     # vec_map = params.get("vectors_map") if isinstance(params.get("vectors_map"), dict) else None
 
     if meta_map is None:
-        # Fetch metadata for all DOIs (fallback)
-        meta_map = {}
+        # Fetch metadata for all DOIs (fallback), shared paper store first
+        meta_map, missing = get_papers(all_dois)
+        fetched = {}
         for d in all_dois:
+            if d in meta_map or d in missing:
+                continue
             try:
-                meta_map[d] = _fetch_metadata(d)
+                fetched[d] = _fetch_metadata(d)
             except Exception:
-                meta_map[d] = {}
+                fetched[d] = {}
+        put_papers(fetched)
+        meta_map.update(fetched)
 
     idx = get_pinecone_index()
     normalized_ids = [normalize_doi(d) for d in all_dois]
@@ -200,9 +158,19 @@ def main(params: dict):
         "references": root_meta.get("references") or 0,
         "referredPapers": [],
         "citatingPapers": [],
-        "computedReferences": "Y" if request_for == "references" else "N",
-        "computedCitating": "Y" if request_for == "citating" else "N",
+        "computedReferences": "Y" if request_for == "references" and not partial else "N",
+        "computedCitating": "Y" if request_for == "citating" and not partial else "N",
     }
+    # when this direction was computed; the starter serves cached results
+    # only while this timestamp is within its freshness window. Partial
+    # results get neither the timestamp nor the flag, so the next request
+    # runs again and completes them.
+    computed_at_field = COMPUTED_AT_FIELDS.get(request_for)
+    if computed_at_field and not partial:
+        result[computed_at_field] = datetime.now(timezone.utc).isoformat()
+    partial_field = PARTIAL_FIELDS.get(request_for)
+    if partial_field:
+        result[partial_field] = partial
 
     # Fill children into appropriate array with detailed metadata and score
     children_objs = [build_paper(d, include_score=True) for d in children]
@@ -214,14 +182,101 @@ def main(params: dict):
         result["citatingPapers"] = children_objs
         result["referredPapers"] = []
 
-    # Save to Cosmos DB (best-effort) and merge when object partially exists
-    cosmos_cfg = cfg.get("cosmos", {})
-    if CosmosClient and cosmos_cfg.get("connection_string"):
+    # Progressive saves: every save of a run carries (runId, runStartedAt,
+    # version). A save is dropped when the stored document already holds
+    # this version or a later one of the same run (activity retries,
+    # out-of-order delivery), or comes from a run that started later (a late
+    # save of a terminated or overlapping older run).
+    run_id = params.get("runId")
+    run_started_at = params.get("runStartedAt")
+    try:
+        version = int(params.get("version") or 0)
+    except (TypeError, ValueError):
+        version = 0
+    if run_id:
+        result["runId"] = run_id
+        result["version"] = version
+        if run_started_at:
+            result["runStartedAt"] = run_started_at
+
+    def _superseded(stored) -> bool:
+        if not run_id or not isinstance(stored, dict) or not stored.get("runId"):
+            return False
+        if stored.get("runId") != run_id:
+            stored_started_at = stored.get("runStartedAt")
+            return bool(run_started_at and stored_started_at and str(stored_started_at) > str(run_started_at))
         try:
-            client = CosmosClient.from_connection_string(cosmos_cfg.get("connection_string"))
-            db = client.get_database_client(cosmos_cfg.get("database"))
-            container = db.get_container_client(cosmos_cfg.get("container"))
+            return int(stored.get("version") or 0) >= version
+        except (TypeError, ValueError):
+            return False
+
+    def _merge_into(existing: dict) -> dict:
+        # If object exists, the direction we just computed replaces
+        # its list; the other direction keeps whatever the existing
+        # object has so an earlier run's work is not lost. A partial
+        # result is merged into the existing list instead, so it
+        # never shrinks a complete graph and successive partial runs
+        # (or early saves of the same run) build on each other.
+
+        existing_cit = existing.get("citatingPapers")
+        existing_ref = existing.get("referredPapers")
+
+        if request_for == "citating":
+            chosen_cit = result.get("citatingPapers", [])
+            if partial:
+                chosen_cit = _union_children(existing_cit, chosen_cit)
+            chosen_ref = existing_ref or []
+        else:
+            chosen_cit = existing_cit or []
+            chosen_ref = result.get("referredPapers", [])
+            if partial:
+                chosen_ref = _union_children(existing_ref, chosen_ref)
+
+        # Ensure vectors in child items are compressed for storage
+        def _ensure_compressed_list(lst):
+            out_list = []
+            for it in lst or []:
+                if isinstance(it, dict):
+                    it_vec = it.get("vector") or []
+                    it["vector"] = _compress_vector(it_vec)
+                    out_list.append(it)
+                else:
+                    out_list.append(it)
+            return out_list
+
+        existing["citatingPapers"] = _ensure_compressed_list(chosen_cit)
+        existing["referredPapers"] = _ensure_compressed_list(chosen_ref)
+
+        # mark the direction we computed; keep the other flag as-is
+        # (a partial run leaves an earlier complete flag in place)
+        flag_field = COMPUTED_FLAGS.get(request_for)
+        if flag_field and not partial:
+            existing[flag_field] = "Y"
+        if computed_at_field and not partial:
+            existing[computed_at_field] = result[computed_at_field]
+        if partial_field and existing.get(flag_field) != "Y":
+            existing[partial_field] = partial
+        elif partial_field:
+            existing[partial_field] = False
+        if run_id:
+            existing["runId"] = run_id
+            existing["version"] = version
+            if run_started_at:
+                existing["runStartedAt"] = run_started_at
+            else:
+                existing.pop("runStartedAt", None)
+
+        # ensure root-level metadata present (prefer existing values)
+        for k in ("authors", "venue", "keywords", "abstract", "vector"):
+            if not existing.get(k) and result.get(k) is not None:
+                existing[k] = result.get(k)
+        return existing
 
+    # Save to Cosmos DB (best-effort) and merge when object partially exists
+    merged = False
+    container = get_cosmos_container()
+    if container is not None:
+        try:
             # Attempt to find existing object by doi
             existing = None
             try:
@@ -232,66 +287,38 @@ def main(params: dict):
             except Exception:
                 logging.exception("Cosmos query failed")
 
+            if _superseded(existing):
+                logging.info("Skipping save %s v%s for %s: stored version is newer", run_id, version, doi)
+                return {"status": "skipped", "doi": doi, "partial": partial}
+
             if existing:
-                # If object exists, prefer any existing child lists; if a list
-                # is missing, use the newly computed list. After merging we
-                # mark both computed flags as 'Y' (the existing object implies
-                # the alternate request was already computed).
-
-                existing_cit = existing.get("citatingPapers")
-                existing_ref = existing.get("referredPapers")
-
-                # Choose lists: keep existing if present and non-empty, else use result's
-                chosen_cit = existing_cit if existing_cit else result.get("citatingPapers", [])
-                chosen_ref = existing_ref if existing_ref else result.get("referredPapers", [])
-
-                # Ensure vectors in child items are compressed for storage
-                def _ensure_compressed_list(lst):
-                    out_list = []
-                    for it in lst or []:
-                        if isinstance(it, dict):
-                            it_vec = it.get("vector") or []
-                            it["vector"] = _compress_vector(it_vec)
-                            out_list.append(it)
-                        else:
-                            out_list.append(it)
-                    return out_list
-
-                merged_cit = _ensure_compressed_list(chosen_cit)
-                merged_ref = _ensure_compressed_list(chosen_ref)
-
-                existing["citatingPapers"] = merged_cit
-                existing["referredPapers"] = merged_ref
-
-                # mark both computed flags as Y since we now have both lists
-                existing["computedCitating"] = "Y"
-                existing["computedReferences"] = "Y"
-
-                # ensure root-level metadata present (prefer existing values)
-                for k in ("authors", "venue", "keywords", "abstract", "vector"):
-                    if not existing.get(k) and result.get(k) is not None:
-                        existing[k] = result.get(k)
-
-                container.upsert_item(existing)
-                result = existing
-                
-            else:
-                container.upsert_item(result)
+                result = _merge_into(existing)
+            container.upsert_item(result)
+            merged = True
 
         except Exception:
             logging.exception("Failed to upsert item to CosmosDB")
+            reconnect(COSMOS)
     else:
         logging.warning("Cosmos client not configured or missing; skipping Cosmos save")
 
     # Save to Redis (best-effort) under normalized doi-id key
-    redis_cfg = cfg.get("redis", {})
     key = normalize_doi(doi)
-    if redis_cfg.get("url"):
+    if config_section("redis").get("url"):
         try:
-            from shared.redis_client import get_redis_client
-
-            r = get_redis_client()
+            r = get_redis()
             if r is not None:
+                if not merged:
+                    # without Cosmos the Redis copy is the document to merge into
+                    try:
+                        stored = json.loads(r.get(key) or "null")
+                    except Exception:
+                        stored = None
+                    if _superseded(stored):
+                        logging.info("Skipping save %s v%s for %s: stored version is newer", run_id, version, doi)
+                        return {"status": "skipped", "doi": doi, "partial": partial}
+                    if isinstance(stored, dict):
+                        result = _merge_into(stored)
                 r.set(key, json.dumps(result))
             else:
                 logging.warning("No redis client available; skipping Redis save")
@@ -300,4 +327,4 @@ def main(params: dict):
     else:
         logging.warning("Redis not configured or client missing; skipping Redis save")
 
-    return {"status": "saved", "doi": doi}
+    return {"status": "saved", "doi": doi, "partial": partial}
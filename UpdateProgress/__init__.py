@@ -1,44 +1,33 @@
-import json
 import logging
 
-try:
-    import redis
-except Exception:
-    redis = None
-
-from shared.utils import normalize_doi
-
-
-def _load_config():
-    return json.load(open("config.json"))
+from shared.progress import make_status, publish_progress
 
 
 def main(params: dict):
-    """Update progress for a DOI in Redis. params: { "doi": <doi>, "progress": <int> }
+    """Publish a progress status for a run.
+
+    params: { "doi", "requestFor", "stage", "progress", "seq", "instanceId", "updatedAt" }
 
-    Stores the numeric progress value under the normalized DOI key.
+    Writes `progress:<requestFor>:<doi>` (with TTL) and publishes it on the
+    channel of the same name; the result document key is left alone.
     """
     doi = params.get("doi")
-    progress = params.get("progress")
-    cfg = _load_config().get("redis", {})
-    url = cfg.get("url")
-    key = normalize_doi(doi)
-
-    if not url:
-        logging.warning("Redis URL not configured; skipping progress update for %s", doi)
+    if not doi:
         return {"status": "skipped"}
-
     try:
-        from shared.redis_client import get_redis_client
-
-        r = get_redis_client()
-        if r is None:
+        status = make_status(
+            doi,
+            params.get("requestFor"),
+            params.get("stage") or "processing",
+            params.get("progress"),
+            params.get("seq"),
+            params.get("instanceId"),
+            params.get("updatedAt"),
+        )
+        if not publish_progress(status):
             logging.warning("No redis client available; skipping progress update for %s", doi)
             return {"status": "skipped"}
-
-        # store simple numeric progress (as string)
-        r.set(key, str(int(progress)))
-        return {"status": "ok", "progress": int(progress)}
+        return {"status": "ok", "progress": status["progress"]}
     except Exception:
         logging.exception("Failed to update progress to Redis for %s", doi)
         return {"status": "error"}
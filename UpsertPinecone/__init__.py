@@ -1,6 +1,8 @@
 import json
 import logging
-from shared.pinecone_client import get_pinecone_index
+from shared.fingerprints import content_fingerprint, record_embedded
+from shared.pinecone_client import get_pinecone_index, invalidate_vectors
+from shared.staging import resolve
 from shared.utils import normalize_doi
 
 OPENALEX_PREFIX = "https://openalex.org/"
@@ -37,8 +39,9 @@ def _clean_metadata(meta):
 
 def main(params: dict):
     doi = params.get("doi")
-    abstract = params.get("abstract") or "NA"
-    metadata = params.get("metadata") or {}
+    # metadata may arrive as a claim-check reference staged by GetMetadataBatch
+    metadata = resolve(params.get("metadata"))
+    abstract = params.get("abstract") or metadata.get("abstract") or "NA"
 
     if isinstance(abstract, list):
         abstract = " ".join(abstract)
@@ -145,9 +148,18 @@ def main(params: dict):
             "authors": cleaned_metadata.get("authors", ["NA"]),
             "references": cleaned_metadata.get("references", ["NA"]),
             "keywords": cleaned_metadata.get("keywords", ["NA"]),
+            # record ids cannot be filtered on; this copy lets ComputeScores
+            # restrict a similarity query to a run's children
+            "paper_id": normalize_doi(doi),
         }
         print("Upserting to Pinecone:", payload)
         idx.upsert_records("my-namespace", [payload])
+        # the record is re-embedded, so any cached vector is now stale
+        invalidate_vectors([payload["id"]])
+        # remember what was embedded so later runs can skip this paper
+        # while its content stays the same
+        embedded = dict(metadata, abstract=params.get("abstract") or metadata.get("abstract"))
+        record_embedded({doi: content_fingerprint(embedded)})
         return {"status": "ok", "id": item_id}
     except Exception as e:
         logging.exception("Failed upsert to Pinecone for %s", doi)
@@ -0,0 +1,179 @@
+"""Benchmark: orchestration replay cost versus graph size.
+
+Durable orchestrators are replayed from the beginning every time they
+resume after a `yield`, deserializing the whole history each time. This
+script models that replay loop for the two processing-phase shapes:
+
+- before: one orchestrator looping GetMetadata -> UpsertPinecone per DOI
+  with the full metadata (abstract included) flowing through history;
+- after:  chunked ProcessPapersOrchestrator sub-orchestrations (50 DOIs
+  each) returning claim-check references, fanned out from the parent.
+
+It needs no Azure services; activities are stubbed with payloads of
+realistic size and history events are JSON round-tripped on every replay,
+which is where the real runtime spends its time.
+
+History is counted the way Durable records it, in both shapes alike: one
+ExecutionStarted event with the input, an OrchestratorStarted /
+OrchestratorCompleted pair per episode, and a scheduled event (with the
+input) plus a completed event (with the result) for every task, including
+each task inside a `task_all` wave. It is optimistic about episodes: a
+whole wave completes in one, where the real runtime may wake the
+orchestrator once per completion.
+
+Usage:
+    python benchmarks/replay_history.py [sizes...]
+"""
+import json
+import sys
+import time
+
+ABSTRACT = "lorem ipsum dolor sit amet " * 60  # ~1.6 KB, typical abstract
+CHUNK = 50
+FANOUT = 16
+
+
+class Task:
+    def __init__(self, kind, name, payload):
+        self.kind = kind
+        self.name = name
+        self.payload = payload
+
+
+class AllTask:
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+
+def run_activity(name, payload):
+    if name == "GetMetadata":
+        return {"id": payload, "doi": payload, "title": "T", "authors": ["A", "B"], "abstract": ABSTRACT}
+    if name == "GetMetadataBatch":
+        return {d: {"$ref": f"stage:run:{d}"} for d in payload["dois"]}
+    return {"status": "ok"}
+
+
+class Replayer:
+    """Minimal stand-in for the Durable replay loop of one instance."""
+
+    def __init__(self, orchestrator, input_, stats):
+        self.orchestrator = orchestrator
+        self.input = input_
+        self.stats = stats
+        # one record per episode: (serialized events, whether it was a wave)
+        self.history = []
+        self.started = json.dumps({"event": "ExecutionStarted", "input": input_})
+
+    # context API used by the modelled orchestrators
+    def call_activity(self, name, payload):
+        return Task("activity", name, payload)
+
+    def call_sub_orchestrator(self, name, payload):
+        return Task("sub", name, payload)
+
+    def task_all(self, tasks):
+        return AllTask(tasks)
+
+    def _execute(self, task):
+        if task.kind == "sub":
+            child = Replayer(SUB_ORCHESTRATORS[task.name], task.payload, self.stats)
+            return child.run()
+        return run_activity(task.name, task.payload)
+
+    def _record(self, pending):
+        tasks = pending.tasks if isinstance(pending, AllTask) else [pending]
+        events = [json.dumps({"event": "OrchestratorStarted"})]
+        for task in tasks:
+            result = self._execute(task)
+            events.append(json.dumps({"event": "TaskScheduled", "name": task.name, "input": task.payload}))
+            events.append(json.dumps({"event": "TaskCompleted", "result": result}))
+        events.append(json.dumps({"event": "OrchestratorCompleted"}))
+        self.history.append((events, isinstance(pending, AllTask)))
+        size = 1 + sum(len(e) for e, _ in self.history)
+        self.stats["max_history"] = max(self.stats["max_history"], size)
+
+    def _replay(self, record):
+        events, is_wave = record
+        decoded = [json.loads(e) for e in events]
+        self.stats["events_replayed"] += len(events)
+        results = [e["result"] for e in decoded if e["event"] == "TaskCompleted"]
+        return results if is_wave else results[0]
+
+    def run(self):
+        while True:
+            self.stats["replays"] += 1
+            # every episode loads the whole history, input included
+            json.loads(self.started)
+            self.stats["events_replayed"] += 1
+            gen = self.orchestrator(self, self.input)
+            cursor = 0
+            value = None
+            try:
+                while True:
+                    pending = gen.send(value)
+                    if cursor < len(self.history):
+                        value = self._replay(self.history[cursor])
+                        cursor += 1
+                        continue
+                    # new work: execute, record, and start a fresh replay
+                    self._record(pending)
+                    break
+            except StopIteration as done:
+                return done.value
+
+
+def before(ctx, dois):
+    for d in dois:
+        meta = yield ctx.call_activity("GetMetadata", d)
+        yield ctx.call_activity("UpsertPinecone", {"doi": d, "abstract": meta["abstract"], "metadata": meta})
+    return len(dois)
+
+
+def process_chunk(ctx, dois):
+    refs = yield ctx.call_activity("GetMetadataBatch", {"dois": dois})
+    for start in range(0, len(dois), FANOUT):
+        wave = [ctx.call_activity("UpsertPinecone", {"doi": d, "metadata": refs[d]}) for d in dois[start:start + FANOUT]]
+        yield ctx.task_all(wave)
+    return refs
+
+
+def after(ctx, dois):
+    chunks = [dois[i:i + CHUNK] for i in range(0, len(dois), CHUNK)]
+    refs = {}
+    for start in range(0, len(chunks), FANOUT):
+        wave = [ctx.call_sub_orchestrator("ProcessPapersOrchestrator", c) for c in chunks[start:start + FANOUT]]
+        for part in (yield ctx.task_all(wave)):
+            refs.update(part)
+    return len(refs)
+
+
+SUB_ORCHESTRATORS = {"ProcessPapersOrchestrator": process_chunk}
+
+
+def measure(orchestrator, n):
+    stats = {"replays": 0, "events_replayed": 0, "max_history": 0}
+    dois = [f"10.1000/paper.{i}" for i in range(n)]
+    t0 = time.perf_counter()
+    Replayer(orchestrator, dois, stats).run()
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+def main(sizes):
+    header = (
+        f"{'DOIs':>6} | {'shape':<6} | {'replays':>8} | {'events replayed':>15} | "
+        f"{'max history (events)':>20} | {'seconds':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for n in sizes:
+        for label, fn in (("before", before), ("after", after)):
+            s = measure(fn, n)
+            print(
+                f"{n:>6} | {label:<6} | {s['replays']:>8} | {s['events_replayed']:>15} | "
+                f"{s['max_history']:>20} | {s['seconds']:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [50, 200, 500, 1000])
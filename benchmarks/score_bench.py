@@ -0,0 +1,90 @@
+"""Benchmark: ComputeScores scoring paths versus graph size and dimension.
+
+Compares, on random vectors:
+
+- legacy: the old per-child `_cosine` (pure Python, parent norm recomputed
+  for every child, try/except around each pair);
+- python: `shared.scoring.cosine_scores_python` (parent norm computed once);
+- numpy:  `shared.scoring.cosine_scores_numpy` (one float32 matrix, one
+  matrix-vector product), when NumPy is installed;
+- matrix: `shared.scoring.matrix_scores` on an already packed matrix, i.e.
+  the scoring step alone without converting Python lists.
+
+Fetching from Pinecone is not included; only the scoring itself is timed.
+
+Usage:
+    python benchmarks/score_bench.py [children...]
+"""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import scoring  # noqa: E402
+
+DIMS = (384, 1024, 1536)
+REPEAT = 3
+
+
+def legacy_cosine(a, b):
+    if not a or not b:
+        return 0.0
+    try:
+        dot = sum(x * y for x, y in zip(a, b))
+        na = math.sqrt(sum(x * x for x in a))
+        nb = math.sqrt(sum(x * x for x in b))
+        if na == 0 or nb == 0:
+            return 0.0
+        return dot / (na * nb)
+    except Exception:
+        return 0.0
+
+
+def legacy_scores(parent, children):
+    return [legacy_cosine(parent, c) if c else 0.0 for c in children]
+
+
+def best_of(fn, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(sizes):
+    paths = [("legacy", legacy_scores), ("python", scoring.cosine_scores_python)]
+    if scoring.np is not None:
+        paths.append(("numpy", scoring.cosine_scores_numpy))
+        paths.append(("matrix", None))
+    else:
+        print("NumPy not installed; skipping the numpy path")
+
+    header = f"{'children':>8} | {'dim':>5} | " + " | ".join(f"{name + ' ms':>10}" for name, _ in paths)
+    print(header)
+    print("-" * len(header))
+    rng = random.Random(42)
+    for n in sizes:
+        for dim in DIMS:
+            parent = [rng.uniform(-1, 1) for _ in range(dim)]
+            # a few missing vectors, as for papers that were never embedded
+            children = [None if i % 50 == 0 else [rng.uniform(-1, 1) for _ in range(dim)] for i in range(n)]
+            reference = legacy_scores(parent, children)
+            cells = []
+            for name, fn in paths:
+                if fn is None:
+                    matrix = scoring.np.asarray([c or [0.0] * dim for c in children], dtype=scoring.np.float32)
+                    cells.append(f"{best_of(scoring.matrix_scores, parent, matrix) * 1000:>10.2f}")
+                    continue
+                got = fn(parent, children)
+                assert all(abs(a - b) < 1e-4 for a, b in zip(got, reference)), name
+                cells.append(f"{best_of(fn, parent, children) * 1000:>10.2f}")
+            print(f"{n:>8} | {dim:>5} | " + " | ".join(cells))
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [100, 500, 2000])
@@ -0,0 +1,282 @@
+"""Process-wide registry of configuration and service clients.
+
+Functions run many invocations in one worker process, so `config.json` is
+read (and sanity-checked) once and every service client is created once and
+shared by all invocations and threads:
+
+- `get_config()` / `config_section(name)`: cached configuration,
+- `get_redis()`: Upstash REST client or redis-py (which pools connections),
+  plus `create_async_redis_client()` for pub/sub in async functions,
+- `get_pinecone()` / `get_pinecone_index()`: Pinecone client and the
+  configured index,
+- `get_cosmos_container()`: the configured Cosmos DB container.
+
+Clients are created lazily under a lock. A client that cannot be created
+(not configured, library missing) is not cached, so a later call retries.
+Redis is pinged at most every `HEALTH_CHECK_INTERVAL` seconds when it is
+handed out and recreated when the ping fails; `reconnect(name)` drops any
+client after a connection error and `health()` probes all of them.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+CONFIG_PATH = "config.json"
+HEALTH_CHECK_INTERVAL = 60.0
+
+REDIS = "redis"
+PINECONE = "pinecone"
+PINECONE_INDEX = "pinecone_index"
+COSMOS = "cosmos"
+
+_lock = threading.RLock()
+_config: Optional[dict] = None
+# name -> [client, last successful health check (monotonic)]
+_clients: Dict[str, list] = {}
+
+
+def validate_config(cfg: dict) -> List[str]:
+    """Return human-readable problems with `cfg`; an empty list means OK."""
+    problems = []
+    for name in ("redis", "pinecone", "cosmos", "openalex", "cache"):
+        if name in cfg and not isinstance(cfg[name], dict):
+            problems.append(f"'{name}' must be an object")
+    redis_cfg = cfg.get("redis") if isinstance(cfg.get("redis"), dict) else {}
+    url = redis_cfg.get("url")
+    if url and not str(url).startswith(("redis://", "rediss://", "unix://", "http://", "https://")):
+        problems.append("redis.url must be a redis://, rediss://, unix:// or http(s):// URL")
+    pine_cfg = cfg.get("pinecone") if isinstance(cfg.get("pinecone"), dict) else {}
+    if bool(pine_cfg.get("api_key")) != bool(pine_cfg.get("index_name")):
+        problems.append("pinecone needs both api_key and index_name")
+    cosmos_cfg = cfg.get("cosmos") if isinstance(cfg.get("cosmos"), dict) else {}
+    if cosmos_cfg.get("connection_string"):
+        for field in ("database", "container"):
+            if not cosmos_cfg.get(field):
+                problems.append(f"cosmos.{field} is required with cosmos.connection_string")
+    openalex_cfg = cfg.get("openalex") if isinstance(cfg.get("openalex"), dict) else {}
+    for field in ("requests_per_second", "fleet_requests_per_second", "fleet_requests_per_day"):
+        value = openalex_cfg.get(field)
+        if value is not None:
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                problems.append(f"openalex.{field} must be a number")
+    return problems
+
+
+def get_config(reload: bool = False) -> dict:
+    """Return the parsed `config.json`, loading and validating it once."""
+    global _config
+    if _config is None or reload:
+        with _lock:
+            if _config is None or reload:
+                try:
+                    with open(CONFIG_PATH) as f:
+                        cfg = json.load(f)
+                except FileNotFoundError:
+                    cfg = {}
+                except Exception:
+                    logging.exception("Could not read %s; running without configuration", CONFIG_PATH)
+                    cfg = {}
+                if not isinstance(cfg, dict):
+                    logging.error("%s must contain a JSON object", CONFIG_PATH)
+                    cfg = {}
+                for problem in validate_config(cfg):
+                    logging.warning("config.json: %s", problem)
+                _config = cfg
+    return _config
+
+
+def config_section(name: str) -> dict:
+    section = get_config().get(name)
+    return section if isinstance(section, dict) else {}
+
+
+def _get(name: str, factory: Callable, probe: Optional[Callable] = None):
+    entry = _clients.get(name)
+    if entry is not None and (probe is None or time.monotonic() - entry[1] < HEALTH_CHECK_INTERVAL):
+        return entry[0]
+    with _lock:
+        entry = _clients.get(name)
+        if entry is not None:
+            if probe is None or time.monotonic() - entry[1] < HEALTH_CHECK_INTERVAL:
+                return entry[0]
+            try:
+                probe(entry[0])
+                entry[1] = time.monotonic()
+                return entry[0]
+            except Exception:
+                logging.warning("%s health check failed; reconnecting", name, exc_info=True)
+                _clients.pop(name, None)
+        try:
+            client = factory()
+        except ImportError as e:
+            logging.warning("Could not create %s client: %s", name, e)
+            client = None
+        except Exception:
+            logging.exception("Could not create %s client", name)
+            client = None
+        if client is not None:
+            _clients[name] = [client, time.monotonic()]
+        return client
+
+
+def reconnect(name: str):
+    """Forget the cached client `name` so the next call creates a new one."""
+    with _lock:
+        _clients.pop(name, None)
+        if name == PINECONE:
+            _clients.pop(PINECONE_INDEX, None)
+
+
+def create_redis_client(url: str, token: Optional[str] = None):
+    """Create a new redis-like client for `url`.
+
+    Prefers the Upstash client (`upstash_redis.Redis`) when available,
+    falling back to redis-py (`redis.from_url`). Returns None when no client
+    can be created.
+    """
+    if not url:
+        return None
+
+    # Try Upstash client first
+    try:
+        import upstash_redis
+
+        try:
+            Redis = getattr(upstash_redis, "Redis", None)
+            if Redis is not None:
+                try:
+                    return Redis(url=url, token=token) if token else Redis(url=url)
+                except TypeError:
+                    # fallback to from_url if signature differs
+                    if hasattr(Redis, "from_url"):
+                        return Redis.from_url(url)
+            # otherwise try module-level from_url
+            if hasattr(upstash_redis, "from_url"):
+                return upstash_redis.from_url(url)
+        except Exception:
+            # If Upstash import succeeds but client initialization fails, continue to fallback
+            pass
+    except Exception:
+        pass
+
+    # Fallback to redis-py
+    try:
+        import redis as redis_py
+
+        return redis_py.from_url(url)
+    except Exception:
+        return None
+
+
+def create_async_redis_client():
+    """New `redis.asyncio` client for `redis.url`, for pub/sub in async functions.
+
+    Returns None for the Upstash REST URL (no pub/sub there) or when
+    redis-py is not installed. Callers close it when done; async clients
+    belong to one event loop, so they are not shared like `get_redis()`.
+    """
+    url = config_section("redis").get("url") or ""
+    if not str(url).startswith(("redis://", "rediss://", "unix://")):
+        return None
+    try:
+        import redis.asyncio as aioredis
+    except Exception:
+        return None
+    try:
+        return aioredis.from_url(url)
+    except Exception:
+        logging.warning("Could not create async redis client", exc_info=True)
+        return None
+
+
+def get_redis():
+    """Shared Redis client from `redis.url` / `redis.token`, or None."""
+    cfg = config_section("redis")
+    if not cfg.get("url"):
+        return None
+    return _get(REDIS, lambda: create_redis_client(cfg.get("url"), cfg.get("token")), probe=lambda r: r.ping())
+
+
+def get_pinecone():
+    """Shared `pinecone.Pinecone` client, or None when not configured/installed."""
+    api_key = config_section("pinecone").get("api_key")
+    if not api_key:
+        return None
+
+    def _create():
+        from pinecone import Pinecone
+
+        return Pinecone(api_key=api_key)
+
+    return _get(PINECONE, _create)
+
+
+def get_pinecone_index():
+    """Shared handle on the configured Pinecone index, or None."""
+    cfg = config_section("pinecone")
+    api_key = cfg.get("api_key")
+    index_name = cfg.get("index_name")
+    if not api_key or not index_name:
+        return None
+
+    def _create():
+        # Preferred new client API
+        pc = get_pinecone()
+        if pc is not None:
+            return pc.Index(index_name)
+        # Fallback to old-style pinecone module
+        import pinecone as pine_mod
+
+        try:
+            pine_mod.init(api_key=api_key)
+        except Exception:
+            # init may be optional for some builds
+            pass
+        return pine_mod.Index(index_name)
+
+    return _get(PINECONE_INDEX, _create)
+
+
+def get_cosmos_container():
+    """Shared container client for `cosmos.database` / `cosmos.container`, or None."""
+    cfg = config_section("cosmos")
+    if not cfg.get("connection_string"):
+        return None
+
+    def _create():
+        from azure.cosmos import CosmosClient
+
+        client = CosmosClient.from_connection_string(cfg.get("connection_string"))
+        return client.get_database_client(cfg.get("database")).get_container_client(cfg.get("container"))
+
+    return _get(COSMOS, _create)
+
+
+def health() -> Dict[str, Optional[bool]]:
+    """Probe every configured service; None means not configured.
+
+    Failed services are reconnected on their next use.
+    """
+    probes = {
+        REDIS: (get_redis, lambda r: r.ping()),
+        PINECONE_INDEX: (get_pinecone_index, lambda idx: idx.describe_index_stats()),
+        COSMOS: (get_cosmos_container, lambda c: c.read()),
+    }
+    out = {}
+    for name, (getter, probe) in probes.items():
+        client = getter()
+        if client is None:
+            out[name] = None
+            continue
+        try:
+            probe(client)
+            out[name] = True
+        except Exception:
+            logging.warning("%s health check failed", name, exc_info=True)
+            reconnect(name)
+            out[name] = False
+    return out
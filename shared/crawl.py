@@ -0,0 +1,173 @@
+"""Level-synchronous BFS crawl used by DurableComputationOrchestrator.
+
+The crawl starts from the root DOI and expands one level at a time with
+`FetchRelated`, fanning each level out in parallel waves. Graph size and
+run time are bounded by:
+
+- `depth`: number of levels to expand below the root (default 2, i.e. the
+  classic gen1/gen2 graph),
+- `maxFrontier`: maximum new DOIs kept per level (an int for every level or
+  a list with one value per level),
+- `maxNodes`: global cap on DOIs in the graph, root included,
+- `timeBudgetSeconds`: no new wave is scheduled once this much orchestration
+  time has elapsed since the crawl started.
+
+Beam mode (`beamWidth` and/or `beamThreshold`) keeps every DOI found at a
+level in the graph but only expands the most relevant ones: the caller's
+`select_frontier` hook scores the level against the root and `select_beam`
+picks the top-K (or those above the similarity threshold) to expand next.
+
+Like everything run by an orchestrator, this code is replayed and must stay
+deterministic: time comes from `context.current_utc_datetime` only.
+"""
+from shared.orchestration import Deadline, dedupe, fan_out
+
+DEFAULT_DEPTH = 2
+MAX_DEPTH = 5
+
+
+def _int_or_none(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _float_or_none(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CrawlOptions:
+    def __init__(
+        self,
+        depth=DEFAULT_DEPTH,
+        max_frontier=None,
+        max_nodes=None,
+        time_budget_seconds=None,
+        beam_width=None,
+        beam_threshold=None,
+    ):
+        self.depth = max(1, min(MAX_DEPTH, int(depth or DEFAULT_DEPTH)))
+        self.max_frontier = max_frontier
+        self.max_nodes = max_nodes
+        self.time_budget_seconds = time_budget_seconds
+        self.beam_width = beam_width
+        self.beam_threshold = beam_threshold
+
+    @property
+    def beam(self) -> bool:
+        return self.beam_width is not None or self.beam_threshold is not None
+
+    @classmethod
+    def from_input(cls, input_: dict) -> "CrawlOptions":
+        frontier = input_.get("maxFrontier")
+        if isinstance(frontier, list):
+            frontier = [_int_or_none(x) for x in frontier]
+        else:
+            frontier = _int_or_none(frontier)
+        return cls(
+            depth=_int_or_none(input_.get("depth")) or DEFAULT_DEPTH,
+            max_frontier=frontier,
+            max_nodes=_int_or_none(input_.get("maxNodes")),
+            time_budget_seconds=_int_or_none(input_.get("timeBudgetSeconds")),
+            beam_width=_int_or_none(input_.get("beamWidth")),
+            beam_threshold=_float_or_none(input_.get("beamThreshold")),
+        )
+
+    def frontier_limit(self, level: int):
+        """Maximum number of new DOIs kept at `level` (1-based), or None."""
+        if isinstance(self.max_frontier, list):
+            if level - 1 < len(self.max_frontier):
+                return self.max_frontier[level - 1]
+            return self.max_frontier[-1] if self.max_frontier else None
+        return self.max_frontier
+
+
+def select_beam(found, scores: dict, width=None, threshold=None):
+    """Pick which DOIs of a level to expand, best similarity first.
+
+    Ties keep crawl order, so the choice is deterministic across replays.
+    """
+    ranked = sorted(found, key=lambda d: -float(scores.get(d) or 0.0))
+    if threshold is not None:
+        ranked = [d for d in ranked if float(scores.get(d) or 0.0) >= threshold]
+    if width is not None:
+        ranked = ranked[:max(0, width)]
+    return ranked
+
+
+def crawl(
+    context,
+    root: str,
+    fetch_opts: dict,
+    options: CrawlOptions,
+    max_fanout: int,
+    select_frontier=None,
+    deadline=None,
+    on_level=None,
+    side=None,
+):
+    """Expand `root` level by level; returns the list of levels (level 0 = [root]).
+
+    `on_level(level, found)`, when given, is called as soon as a level is
+    known. It must not wait for anything itself; work it wants to start
+    (e.g. publishing the level early) should ride along with the next
+    waves through `side` so it never holds up the expansion.
+    `select_frontier(level, found)`, when given, is a generator function
+    returning which of the DOIs found at `level` to expand next (beam mode).
+    With a `shared.orchestration.Deadline`, expansion stops once
+    `Deadline.EXPAND_SHARE` of the request's budget is used. `side` is
+    passed on to `fan_out` to schedule extra tasks with each wave.
+    Use with `yield from` inside an orchestrator.
+    """
+    started = context.current_utc_datetime
+    levels = [[root]]
+    seen = [root]
+    frontier = [root]
+
+    def _out_of_time():
+        if not options.time_budget_seconds:
+            return False
+        return (context.current_utc_datetime - started).total_seconds() >= options.time_budget_seconds
+
+    share = Deadline.EXPAND_SHARE
+    for level in range(1, options.depth + 1):
+        if not frontier or _out_of_time():
+            break
+        if deadline is not None and deadline.passed(share):
+            deadline.partial = True
+            break
+
+        related = []
+        width = max(1, int(max_fanout or 1))
+        for start in range(0, len(frontier), width):
+            if start and _out_of_time():
+                break
+            wave = [dict(fetch_opts, doi=d) for d in frontier[start:start + width]]
+            related.extend((yield from fan_out(context, 'FetchRelated', wave, width, deadline, share, side)))
+            if deadline is not None and deadline.partial:
+                break
+
+        found = dedupe([x for r in related for x in (r or [])], exclude=seen)
+        limit = options.frontier_limit(level)
+        if limit is not None:
+            found = found[:limit]
+        if options.max_nodes is not None:
+            found = found[:max(0, options.max_nodes - len(seen))]
+
+        print(f"Crawl level {level}: {len(found)} new DOIs")
+        levels.append(found)
+        seen.extend(found)
+        if on_level is not None:
+            on_level(level, found)
+        if options.max_nodes is not None and len(seen) >= options.max_nodes:
+            break
+
+        frontier = found
+        if select_frontier is not None and level < options.depth:
+            frontier = yield from select_frontier(level, found)
+            print(f"Crawl level {level}: expanding {len(frontier)} of {len(found)} DOIs")
+    return levels
@@ -0,0 +1,75 @@
+"""Content fingerprints of papers already upserted into Pinecone.
+
+`UpsertPinecone` records a fingerprint of the metadata it embedded under
+`embedded:<doi>`. Before a chunk is upserted, `GetMetadataBatch` compares
+the current metadata against those fingerprints (one MGET) so overlapping
+crawls skip papers whose record in the index is already up to date.
+
+The fingerprint only covers the fields that end up in the Pinecone record,
+so e.g. a changed citation count does not trigger a re-embed.
+"""
+import hashlib
+import json
+import logging
+from typing import Dict, Set
+
+from shared.redis_client import get_redis_client, set_many
+from shared.utils import normalize_doi
+
+KEY_PREFIX = "embedded:"
+# re-embed at least weekly so a rebuilt index catches up on its own
+TTL_SECONDS = 7 * 24 * 3600
+FIELDS = ("abstract", "authors", "references", "referenced_works", "keywords")
+# bump when the layout of the Pinecone record changes so every paper is
+# upserted again once
+RECORD_VERSION = 2
+
+
+def embedded_key(doi: str) -> str:
+    return KEY_PREFIX + normalize_doi(doi).lower()
+
+
+def content_fingerprint(meta: dict) -> str:
+    # empty fields are dropped by the paper store and staging encodings, so
+    # treat them all alike
+    content = {k: (meta or {}).get(k) or None for k in FIELDS}
+    content["_v"] = RECORD_VERSION
+    raw = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def unchanged(meta_map: Dict[str, dict]) -> Set[str]:
+    """DOIs whose recorded fingerprint matches their current metadata."""
+    dois = [d for d in (meta_map or {}) if d]
+    if not dois:
+        return set()
+    r = get_redis_client()
+    if r is None:
+        return set()
+    try:
+        values = r.mget(*[embedded_key(d) for d in dois])
+    except Exception:
+        logging.warning("Fingerprint lookup failed", exc_info=True)
+        return set()
+    out = set()
+    for d, value in zip(dois, values or []):
+        if isinstance(value, bytes):
+            value = value.decode("ascii")
+        if value and value == content_fingerprint(meta_map[d]):
+            out.add(d)
+    return out
+
+
+def record_embedded(fingerprints: Dict[str, str]):
+    """Remember DOI -> fingerprint for papers just upserted."""
+    entries = [(embedded_key(d), fp) for d, fp in (fingerprints or {}).items() if d and fp]
+    if not entries:
+        return
+    r = get_redis_client()
+    if r is None:
+        return
+    try:
+        set_many(r, [(key, fp, TTL_SECONDS) for key, fp in entries])
+    except Exception:
+        logging.warning("Fingerprint write failed", exc_info=True)
+
@@ -0,0 +1,171 @@
+"""Persistent on-disk cache for OpenAlex responses.
+
+A single SQLite file per worker (under the temp directory by default) stores
+response bodies keyed by normalized URL + query parameters. Entries carry a
+per-endpoint TTL and the validators (ETag / Last-Modified) OpenAlex sent, so
+stale entries can be revalidated with a conditional request instead of being
+downloaded again. Total size is bounded with least-recently-used eviction.
+
+Cache failures are never fatal: callers treat any error as a miss.
+"""
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+
+# query params that identify the caller rather than the resource
+IGNORED_PARAMS = ("mailto", "api_key")
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "graphi-openalex-cache.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# TTLs in seconds: single works change rarely, citing lists grow daily
+TTL_ENTITY = 7 * 24 * 3600
+TTL_CITES = 24 * 3600
+TTL_DEFAULT = 3 * 24 * 3600
+
+# check the size bound every N writes rather than on every put
+EVICT_EVERY = 50
+
+
+def cache_key(url: str, params: Optional[dict] = None) -> str:
+    """Normalize a request into a stable cache key."""
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+    base = url.rstrip("/")
+    return f"{base}?{urlencode(items)}" if items else base
+
+
+def ttl_for(path: str, params: Optional[dict] = None, ttls: Optional[dict] = None) -> int:
+    """Pick the TTL for a request based on the endpoint it targets."""
+    ttls = ttls or {}
+    flt = str((params or {}).get("filter") or "")
+    if "cites:" in flt:
+        return int(ttls.get("cites", TTL_CITES))
+    if "/works/" in path and not flt:
+        return int(ttls.get("entity", TTL_ENTITY))
+    return int(ttls.get("default", TTL_DEFAULT))
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "last_modified", "expires_at")
+
+    def __init__(self, body: str, etag: Optional[str], last_modified: Optional[str], expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Thread-safe, size-bounded LRU response cache backed by SQLite."""
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock:
+            # WAL lets several worker processes on the same host share the file
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " body BLOB NOT NULL,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " size INTEGER NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        body, etag, last_modified, expires_at = row
+        return CacheEntry(zlib.decompress(body).decode("utf-8"), etag, last_modified, expires_at)
+
+    def put(self, key: str, body: str, ttl: int, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        blob = zlib.compress(body.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, body, etag, last_modified, expires_at, accessed_at, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, blob, etag, last_modified, now + ttl, now, len(blob)),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict()
+
+    def touch(self, key: str, ttl: int):
+        """Extend an entry after a successful revalidation (HTTP 304)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?", (now + ttl, now, key)
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        # caller holds the lock
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall()
+        victims = []
+        for key, size in rows:
+            if total <= target:
+                break
+            victims.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._conn.commit()
+        logging.info("OpenAlex response cache evicted %d entries", len(victims))
+
+
+def open_cache(cfg: dict) -> Tuple[Optional[ResponseCache], dict]:
+    """Create the response cache from the `openalex.cache` config section.
+
+    Returns (cache or None when disabled/unavailable, ttl overrides).
+    """
+    cache_cfg = cfg.get("cache") or {}
+    if cache_cfg.get("enabled") is False:
+        return None, {}
+    try:
+        cache = ResponseCache(
+            path=cache_cfg.get("path") or DEFAULT_PATH,
+            max_bytes=int(cache_cfg.get("max_bytes") or DEFAULT_MAX_BYTES),
+        )
+    except Exception:
+        logging.exception("Could not open OpenAlex response cache; continuing without it")
+        return None, {}
+    return cache, cache_cfg.get("ttl") or {}
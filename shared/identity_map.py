@@ -0,0 +1,131 @@
+"""Bidirectional DOI <-> OpenAlex work ID map.
+
+Every work JSON that passes through the system is recorded here, both in a
+bounded in-process LRU and in Redis (`oa:w2d:<W id>` / `oa:d2w:<doi>`), so
+later lookups can skip a full work fetch just to translate identifiers.
+Lookups are served in bulk: memory first, then one MGET for the rest.
+
+Works that have no DOI are remembered too (as "-") so references without a
+DOI are not re-resolved on every crawl.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from shared.redis_client import get_redis_client, set_many
+from shared.utils import normalize_doi
+
+W2D_PREFIX = "oa:w2d:"
+D2W_PREFIX = "oa:d2w:"
+NO_DOI = "-"
+# identifiers are stable, so entries can live for a long time
+TTL_SECONDS = 30 * 24 * 3600
+MAX_MEMORY_ENTRIES = 100000
+
+_lock = threading.Lock()
+_w2d: "OrderedDict[str, str]" = OrderedDict()
+_d2w: "OrderedDict[str, str]" = OrderedDict()
+
+
+def short_id(wid: str) -> str:
+    """Accept 'https://openalex.org/W123' or 'W123' and return 'W123'."""
+    if isinstance(wid, str) and "openalex.org" in wid:
+        return wid.rstrip("/\n \t").split("/")[-1]
+    return wid
+
+
+def _doi_key(doi: str) -> str:
+    return normalize_doi(doi).lower()
+
+
+def _remember(table: OrderedDict, key: str, value: str) -> bool:
+    """Insert into an LRU table; returns True when the entry is new/changed."""
+    with _lock:
+        changed = table.get(key) != value
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > MAX_MEMORY_ENTRIES:
+            table.popitem(last=False)
+    return changed
+
+
+def _recall(table: OrderedDict, key: str) -> Optional[str]:
+    with _lock:
+        value = table.get(key)
+        if value is not None:
+            table.move_to_end(key)
+        return value
+
+
+def _work_doi(w: dict) -> Optional[str]:
+    return (w.get("ids") or {}).get("doi") or w.get("doi")
+
+
+def record_works(works: Iterable[dict]):
+    """Record the identity of every work (full or `select`-ed JSON)."""
+    writes = []
+    for w in works or []:
+        if not isinstance(w, dict) or not w.get("id"):
+            continue
+        wid = short_id(w["id"])
+        doi = _work_doi(w)
+        if _remember(_w2d, wid, doi or NO_DOI):
+            writes.append((W2D_PREFIX + wid, doi or NO_DOI))
+        if doi and _remember(_d2w, _doi_key(doi), wid):
+            writes.append((D2W_PREFIX + _doi_key(doi), wid))
+    if not writes:
+        return
+    r = get_redis_client()
+    if r is None:
+        return
+    try:
+        set_many(r, [(key, value, TTL_SECONDS) for key, value in writes])
+    except Exception:
+        logging.warning("Identity map write failed", exc_info=True)
+
+
+def _lookup(keys: Dict[str, str], table: OrderedDict, prefix: str) -> Dict[str, str]:
+    """Resolve {original: table key} via memory then a single Redis MGET."""
+    out, pending = {}, {}
+    for original, key in keys.items():
+        value = _recall(table, key)
+        if value is not None:
+            out[original] = value
+        else:
+            pending[original] = key
+    if not pending:
+        return out
+    r = get_redis_client()
+    if r is None:
+        return out
+    try:
+        values = r.mget(*[prefix + k for k in pending.values()])
+    except Exception:
+        logging.warning("Identity map lookup failed", exc_info=True)
+        return out
+    for (original, key), value in zip(pending.items(), values or []):
+        if value is None:
+            continue
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        _remember(table, key, value)
+        out[original] = value
+    return out
+
+
+def lookup_dois(wids: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Map OpenAlex work IDs to DOIs.
+
+    Known IDs map to their DOI, or to None when the work has no DOI.
+    Unknown IDs are left out so the caller can resolve them over the network.
+    """
+    keys = {w: short_id(w) for w in wids or [] if w}
+    found = _lookup(keys, _w2d, W2D_PREFIX)
+    return {w: (None if v == NO_DOI else v) for w, v in found.items()}
+
+
+def lookup_wids(dois: Iterable[str]) -> Dict[str, str]:
+    """Map DOIs to short OpenAlex work IDs; unknown DOIs are left out."""
+    keys = {d: _doi_key(d) for d in dois or [] if d}
+    return _lookup(keys, _d2w, D2W_PREFIX)
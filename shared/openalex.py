@@ -0,0 +1,251 @@
+"""Shared OpenAlex HTTP client.
+
+All OpenAlex traffic goes through one pooled keep-alive `requests.Session`
+per worker process so TLS connections are reused across activity calls.
+The client also:
+
+- retries connection errors, 429 and 5xx responses with bounded
+  exponential backoff and full jitter,
+- honors `Retry-After` when OpenAlex sends one,
+- throttles itself with an in-process token bucket and, when Redis is
+  configured, a fleet-wide budget (`shared.rate_limit`),
+- adds the polite-pool `mailto` (and optional `api_key`) to every request,
+- serves repeated requests from a local SQLite cache (`shared.http_cache`),
+  revalidating stale entries with ETag / If-Modified-Since.
+
+Settings are read from the `openalex` section of `config.json`:
+
+    "openalex": { "base_url": "https://api.openalex.org", "api_key": "",
+                  "mailto": "you@example.org", "requests_per_second": 10,
+                  "fleet_requests_per_second": 10, "fleet_requests_per_day": 100000,
+                  "cache": { "enabled": true, "path": "", "max_bytes": 268435456,
+                             "ttl": { "entity": 604800, "cites": 86400, "default": 259200 } } }
+"""
+import json
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared.clients import config_section
+from shared.http_cache import cache_key, open_cache, ttl_for
+from shared.metadata import bare_doi
+
+DEFAULT_BASE_URL = "https://api.openalex.org"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting calls to `rate` per second.
+
+    `capacity` controls how large a burst is allowed after an idle period.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; return the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or an HTTP date."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class OpenAlexClient:
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        mailto: Optional[str] = None,
+        api_key: Optional[str] = None,
+        requests_per_second: float = 10.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        timeout: float = 30.0,
+        pool_size: int = 32,
+    ):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.mailto = mailto
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.limiter = TokenBucket(requests_per_second)
+        # optional fleet-wide limiter (see shared.rate_limit), set by get_openalex_client
+        self.shared_limiter = None
+        # optional on-disk response cache (see shared.http_cache)
+        self.cache = None
+        self.cache_ttls = {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt: int, resp: Optional[requests.Response] = None) -> float:
+        retry_after = _retry_after_seconds(resp) if resp is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # full jitter: uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get_json(self, path: str, params: Optional[dict] = None) -> dict:
+        """GET an OpenAlex path (or absolute URL) and return the decoded JSON.
+
+        Raises `requests.HTTPError` for non-retryable statuses (e.g. 404) and
+        once retries are exhausted.
+        """
+        url = path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+        query = dict(params or {})
+        if self.mailto:
+            query.setdefault("mailto", self.mailto)
+        if self.api_key:
+            query.setdefault("api_key", self.api_key)
+
+        key, entry, headers = None, None, {}
+        if self.cache is not None:
+            key = cache_key(url, query)
+            try:
+                entry = self.cache.get(key)
+            except Exception:
+                logging.warning("OpenAlex response cache read failed", exc_info=True)
+            if entry is not None:
+                if entry.fresh:
+                    return json.loads(entry.body)
+                # stale: ask OpenAlex whether our copy is still current
+                headers = entry.conditional_headers()
+
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            if self.shared_limiter is not None:
+                self.shared_limiter.acquire()
+            resp = None
+            try:
+                resp = self.session.get(url, params=query, headers=headers, timeout=self.timeout)
+                if resp.status_code == 304 and entry is not None:
+                    self._cache_store(key, url, params, touch=True)
+                    return json.loads(entry.body)
+                if resp.status_code not in RETRY_STATUSES:
+                    resp.raise_for_status()
+                    data = resp.json()
+                    self._cache_store(key, url, params, resp=resp)
+                    return data
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            if attempt >= self.max_retries:
+                resp.raise_for_status()
+            delay = self._backoff(attempt, resp)
+            logging.warning(
+                "OpenAlex request to %s failed (%s); retrying in %.2fs",
+                url,
+                resp.status_code if resp is not None else "connection error",
+                delay,
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def _cache_store(self, key, url, params, resp=None, touch=False):
+        if key is None:
+            return
+        ttl = ttl_for(url, params, self.cache_ttls)
+        try:
+            if touch:
+                self.cache.touch(key, ttl)
+            else:
+                self.cache.put(
+                    key,
+                    resp.text,
+                    ttl,
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                )
+        except Exception:
+            logging.warning("OpenAlex response cache write failed", exc_info=True)
+
+    def get_work_by_doi(self, doi: str) -> Optional[dict]:
+        """Fetch a single work by DOI. Returns None when OpenAlex has no match."""
+        try:
+            return self.get_json(f"/works/https://doi.org/{bare_doi(doi)}")
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+
+_client: Optional[OpenAlexClient] = None
+_client_lock = threading.Lock()
+
+
+def get_openalex_client() -> OpenAlexClient:
+    """Return the process-wide OpenAlex client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                cfg = config_section("openalex")
+                _client = OpenAlexClient(
+                    base_url=cfg.get("base_url"),
+                    mailto=cfg.get("mailto"),
+                    api_key=cfg.get("api_key"),
+                    requests_per_second=float(cfg.get("requests_per_second") or 10.0),
+                )
+                _client.shared_limiter = _make_shared_limiter(cfg)
+                _client.cache, _client.cache_ttls = open_cache(cfg)
+    return _client
+
+
+def _make_shared_limiter(cfg: dict):
+    """Build the Redis-backed fleet limiter when Redis is configured."""
+    if cfg.get("fleet_limit") is False:
+        return None
+    try:
+        from shared.redis_client import get_redis_client
+        from shared.rate_limit import RedisRateLimiter
+
+        r = get_redis_client()
+        if r is None:
+            return None
+        return RedisRateLimiter(
+            r,
+            per_second=float(cfg.get("fleet_requests_per_second") or 10.0),
+            per_day=int(cfg.get("fleet_requests_per_day") or 100000),
+        )
+    except Exception:
+        logging.exception("Could not create fleet-wide OpenAlex rate limiter")
+        return None
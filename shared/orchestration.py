@@ -0,0 +1,214 @@
+"""Deterministic helpers shared by the orchestrator functions.
+
+Everything here runs inside orchestrator code, which is replayed from the
+start on every `yield`; helpers must therefore be deterministic and only
+schedule work through the orchestration context. Generator helpers are used
+with `yield from` so their yields go straight to the Durable runtime.
+"""
+import math
+from datetime import datetime, timedelta
+
+# Number of DOIs handled by one ProcessPapersOrchestrator sub-orchestration,
+# which is also the GetMetadataBatch size (OpenAlex OR-filter limit).
+METADATA_BATCH_SIZE = 50
+
+
+def dedupe(items, exclude=()):
+    """Order-preserving dedupe that also drops anything found in `exclude`.
+
+    Orchestrator code must be deterministic across replays, so we never rely
+    on set iteration order here.
+    """
+    seen = set(exclude)
+    out = []
+    for x in items:
+        if x and x not in seen:
+            seen.add(x)
+            out.append(x)
+    return out
+
+
+def chunked(items, size):
+    """Split `items` into consecutive lists of at most `size` elements."""
+    size = max(1, int(size or 1))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def fan_out_tasks(context, make_task, inputs, width, deadline=None, share=1.0, side=None):
+    """Schedule `make_task(index, input)` for every input, `width` at a time.
+
+    Inputs are scheduled in waves through `context.task_all`, so a whole
+    batch of work costs roughly one round trip per wave instead of one per item.
+    Results are returned in the same order as `inputs`.
+
+    With a `Deadline`, no wave starts after `share` of the budget and a
+    running wave is abandoned at that point; only completed waves are
+    returned and `deadline.partial` is set.
+
+    `side`, when given, is called before each wave and returns extra tasks
+    (e.g. progress updates) to schedule with it; their results are dropped.
+    The wave waits for them but they do not count against the deadline.
+    """
+    results = []
+    width = max(1, int(width or 1))
+    for start in range(0, len(inputs), width):
+        if deadline is not None and deadline.passed(share):
+            deadline.partial = True
+            break
+        wave = [make_task(start + i, x) for i, x in enumerate(inputs[start:start + width])]
+        extra = list(side()) if side is not None else []
+        if deadline is None:
+            results.extend((yield context.task_all(wave + extra))[:len(wave)])
+            continue
+        finished, values = yield from race(context, context.task_all(wave), deadline.cutoff(share), extra)
+        if not finished:
+            deadline.partial = True
+            break
+        results.extend(values[:len(wave)])
+    return results
+
+
+def fan_out(context, activity, inputs, width, deadline=None, share=1.0, side=None):
+    """Call `activity` once per input with at most `width` calls in flight."""
+    return (
+        yield from fan_out_tasks(
+            context, lambda _, x: context.call_activity(activity, x), inputs, width, deadline, share, side
+        )
+    )
+
+
+class Deadline:
+    """Per-request time budget measured on the replay-safe orchestration clock.
+
+    Phases stop at different shares of the budget so there is always time
+    left to score and save what is done: expansion stops first, processing
+    next, and scoring gets whatever remains up to the hard deadline.
+    `partial` is set as soon as any work is skipped or abandoned.
+    `seconds` comes straight from the request; anything that is not a
+    positive number means no deadline.
+    """
+
+    EXPAND_SHARE = 0.5
+    PROCESS_SHARE = 0.8
+
+    def __init__(self, context, seconds=None):
+        self.context = context
+        self.start = context.current_utc_datetime
+        seconds = self._seconds(seconds)
+        self.at = self.start + timedelta(seconds=seconds) if seconds else None
+        self.partial = False
+
+    @staticmethod
+    def _seconds(value):
+        try:
+            seconds = float(value) if value not in (None, "") else None
+        except (TypeError, ValueError):
+            return None
+        return seconds if seconds is not None and math.isfinite(seconds) and seconds > 0 else None
+
+    def cutoff(self, share=1.0):
+        if self.at is None:
+            return None
+        return self.start + (self.at - self.start) * share
+
+    def passed(self, share=1.0) -> bool:
+        cutoff = self.cutoff(share)
+        return cutoff is not None and self.context.current_utc_datetime >= cutoff
+
+    def to_input(self):
+        """JSON form of this budget for a sub-orchestration (see `from_input`)."""
+        if self.at is None:
+            return None
+        return {"start": self.start.isoformat(), "at": self.at.isoformat()}
+
+    @classmethod
+    def from_input(cls, context, value) -> "Deadline":
+        """The parent's budget inside a sub-orchestration, shares included."""
+        deadline = cls(context)
+        if value:
+            deadline.start = datetime.fromisoformat(value["start"])
+            deadline.at = datetime.fromisoformat(value["at"])
+        return deadline
+
+
+def race(context, task, cutoff, side=()):
+    """Wait for `task` but give up at `cutoff` (a datetime or None).
+
+    Returns (finished, result). Abandoned tasks keep running in the
+    background; their results are simply not waited for. `side` tasks are
+    scheduled and waited for alongside, whatever happens to `task`.
+    """
+    side = list(side or [])
+    if cutoff is None:
+        if side:
+            return True, (yield context.task_all([task] + side))[0]
+        return True, (yield task)
+    if context.current_utc_datetime >= cutoff:
+        if side:
+            yield context.task_all(side)
+        return False, None
+    timer = context.create_timer(cutoff)
+    if side:
+        winner = (yield context.task_all([context.task_any([task, timer])] + side))[0]
+    else:
+        winner = yield context.task_any([task, timer])
+    if winner == timer:
+        return False, None
+    try:
+        timer.cancel()
+    except ValueError:
+        # the timer already fired while the side tasks were running
+        pass
+    return True, task.result
+
+
+def process_papers(context, dois, metadata_map, state, max_fanout, progress=None, deadline=None, report=True):
+    """Fetch metadata and upsert vectors for every DOI not yet in `metadata_map`.
+
+    For each chunk of DOIs: fetch metadata -> compute embeddings -> upsert
+    pinecone, inside a ProcessPapersOrchestrator sub-orchestration. The
+    calling instance only records one compact result per chunk, so its
+    history stays small however large the graph gets. Metadata comes back
+    as claim-check references that SaveCosmosRedis resolves itself.
+
+    `state["chunks"]` numbers sub-orchestrations across calls and
+    `state["subId"]` prefixes their instance IDs; it must include the run's
+    token so they never clash with those of earlier runs of the same DOI,
+    which a forced refresh does not terminate. `state["runId"]` keys the
+    staged payloads. With `progress`, pending progress updates go out with
+    each wave and, when `report` is set, every wave publishes how much of
+    `dois` is done. With a `deadline`, no chunk starts after
+    `Deadline.PROCESS_SHARE` of the budget and unfinished chunks are left
+    out of `metadata_map`.
+    """
+    pending = [d for d in dois if d not in metadata_map]
+    chunks = chunked(pending, METADATA_BATCH_SIZE)
+    width = max(1, int(max_fanout))
+    for start in range(0, len(chunks), width):
+        if deadline is not None and deadline.passed(Deadline.PROCESS_SHARE):
+            deadline.partial = True
+            return
+        wave = []
+        for chunk in chunks[start:start + width]:
+            wave.append(
+                context.call_sub_orchestrator(
+                    'ProcessPapersOrchestrator',
+                    {"dois": chunk, "runId": state["runId"], "maxFanout": max_fanout},
+                    f"{state['subId']}:papers:{state['chunks']}",
+                )
+            )
+            state["chunks"] += 1
+        side = progress.take() if progress is not None else []
+        cutoff = deadline.cutoff(Deadline.PROCESS_SHARE) if deadline is not None else None
+        finished, parts = yield from race(context, context.task_all(wave), cutoff, side)
+        if not finished:
+            deadline.partial = True
+            return
+        for part in parts:
+            metadata_map.update(part or {})
+
+        if progress is not None and report and dois:
+            done = sum(1 for d in dois if d in metadata_map) / len(dois)
+            # processing covers 20% -> 80% of the run; the update rides
+            # along with the next wave
+            progress.report("processing", 20 + int(60 * done), publish=True)
@@ -0,0 +1,93 @@
+"""Cross-instance store of simplified paper metadata in Redis.
+
+Values are the dicts produced by `shared.metadata.simplify_work`, keyed by the
+normalized DOI so every worker (and every orchestration) shares them. Papers
+OpenAlex does not know are stored as short-lived negative entries so we stop
+asking for them.
+
+Encoding: JSON without empty fields, zlib-compressed and base64-encoded so it
+survives both redis-py and the Upstash REST client. Negative entries are a
+single "-".
+"""
+import base64
+import json
+import logging
+import zlib
+from typing import Dict, Iterable, Set, Tuple
+
+from shared.redis_client import get_redis_client, set_many
+from shared.utils import normalize_doi
+
+KEY_PREFIX = "paper:"
+NEGATIVE = "-"
+TTL_SECONDS = 7 * 24 * 3600
+NEGATIVE_TTL_SECONDS = 24 * 3600
+
+
+def paper_key(doi: str) -> str:
+    # DOIs are case-insensitive, so fold case for the shared key
+    return KEY_PREFIX + normalize_doi(doi).lower()
+
+
+def encode_value(meta: dict) -> str:
+    """Compact, text-safe encoding used for metadata values in Redis."""
+    compact = {k: v for k, v in meta.items() if v not in (None, "", [], {})}
+    raw = json.dumps(compact, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.b64encode(zlib.compress(raw)).decode("ascii")
+
+
+def decode_value(value) -> dict:
+    if isinstance(value, bytes):
+        value = value.decode("ascii")
+    return json.loads(zlib.decompress(base64.b64decode(value)).decode("utf-8"))
+
+
+def get_papers(dois: Iterable[str]) -> Tuple[Dict[str, dict], Set[str]]:
+    """Look up many DOIs with a single MGET.
+
+    Returns (DOI -> metadata for hits, DOIs known to be missing from
+    OpenAlex). DOIs in neither are unknown and need a network lookup.
+    """
+    dois = [d for d in dict.fromkeys(dois or []) if d]
+    found, missing = {}, set()
+    if not dois:
+        return found, missing
+    r = get_redis_client()
+    if r is None:
+        return found, missing
+    try:
+        values = r.mget(*[paper_key(d) for d in dois])
+    except Exception:
+        logging.warning("Paper store lookup failed", exc_info=True)
+        return found, missing
+
+    for d, value in zip(dois, values or []):
+        if value is None:
+            continue
+        if value in (NEGATIVE, NEGATIVE.encode()):
+            missing.add(d)
+            continue
+        try:
+            meta = decode_value(value)
+        except Exception:
+            continue
+        # the cached entry may have been written under another spelling
+        meta["id"] = d
+        meta["doi"] = d
+        found[d] = meta
+    return found, missing
+
+
+def put_papers(meta_map: Dict[str, dict], missing: Iterable[str] = ()):
+    """Store metadata for many DOIs (and negative entries) in one pipeline."""
+    entries = [(paper_key(d), encode_value(m), TTL_SECONDS) for d, m in (meta_map or {}).items() if d and m]
+    entries += [(paper_key(d), NEGATIVE, NEGATIVE_TTL_SECONDS) for d in missing or () if d]
+    if not entries:
+        return
+    r = get_redis_client()
+    if r is None:
+        return
+    try:
+        set_many(r, entries)
+    except Exception:
+        logging.warning("Paper store write failed", exc_info=True)
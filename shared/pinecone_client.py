@@ -6,48 +6,191 @@ Preferred usage (if available):
   index = pc.Index(name)
 
 Fallback: old-style `pinecone` package with `pinecone.init(...)` and `pinecone.Index(name)`.
-This helper reads `config.json` for api_key/environment/index_name when needed.
+Clients are created once per process by `shared.clients`, which reads
+`config.json` for api_key/environment/index_name.
+
+`fetch_vectors` fetches many vectors at once: IDs are split into chunks that
+fit in one fetch request, chunks are fetched concurrently, and IDs missing
+from the index are simply left out instead of failing the whole batch.
+
+Vectors are read through the process-local cache in `shared.vector_cache`,
+so only IDs it does not hold are fetched from the index.
+
+`query_scores` lets Pinecone compute similarities server-side: a query by
+the parent's ID, filtered on the `paper_id` field UpsertPinecone stores with
+every record, returns only IDs and scores instead of full vectors.
 """
-import json
 import logging
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
+try:
+    import numpy as np
+except Exception:
+    np = None
 
-def _load_config():
-    try:
-        return json.load(open("config.json"))
-    except Exception:
-        return {}
+from shared import clients
+from shared.clients import config_section
+from shared.vector_cache import get_vector_cache
 
+DEFAULT_NAMESPACE = "my-namespace"
+# IDs travel in the query string, so keep each fetch well below URL limits
+FETCH_BATCH_SIZE = 100
+FETCH_WORKERS = 8
+# Pinecone caps both top_k and the size of an $in filter at 10000
+QUERY_BATCH_SIZE = 1000
+# "fetch": download vectors and compute cosine locally; "query": let the
+# index score children (requires a cosine-metric index)
+SCORE_MODES = ("fetch", "query")
+DEFAULT_SCORE_MODE = "fetch"
 
-def get_pinecone_index(index_name: Optional[str] = None):
-    cfg = _load_config().get("pinecone", {})
-    api_key = cfg.get("api_key")
-    idx_name = index_name or cfg.get("index_name")
 
-    if not api_key or not idx_name:
-        logging.warning("Pinecone api_key or index_name missing in config.json")
-        return None
+def score_mode(requested: Optional[str] = None) -> str:
+    """Scoring mode from the request, else `pinecone.score_mode` in config.json."""
+    mode = (requested or config_section("pinecone").get("score_mode") or DEFAULT_SCORE_MODE).lower()
+    return mode if mode in SCORE_MODES else DEFAULT_SCORE_MODE
 
-    # Preferred new client API
-    try:
-        from pinecone import Pinecone
 
-        pc = Pinecone(api_key=api_key)
-        return pc.Index(idx_name)
-    except Exception:
-        pass
+def get_pinecone_index(index_name: Optional[str] = None):
+    """Return the configured index (shared per process), or `index_name`."""
+    cfg = config_section("pinecone")
+    if index_name is None or index_name == cfg.get("index_name"):
+        if not cfg.get("api_key") or not cfg.get("index_name"):
+            logging.warning("Pinecone api_key or index_name missing in config.json")
+            return None
+        return clients.get_pinecone_index()
 
-    # Fallback to old-style pinecone module
+    pc = clients.get_pinecone()
+    if pc is None:
+        logging.warning("Pinecone api_key missing in config.json")
+        return None
     try:
-        import pinecone as pine_mod
-
-        try:
-            pine_mod.init(api_key=api_key)
-        except Exception:
-            # init may be optional for some builds
-            pass
-        return pine_mod.Index(idx_name)
+        return pc.Index(index_name)
     except Exception:
         logging.exception("No Pinecone client available")
         return None
+
+
+def _vector_values(vectors, vid):
+    v = vectors.get(vid) if hasattr(vectors, "get") else None
+    if v is None:
+        return None
+    if isinstance(v, dict):
+        return v.get("values")
+    return getattr(v, "values", None)
+
+
+def _fetch_chunk(index, ids: List[str], namespace: str) -> Dict[str, list]:
+    try:
+        res = index.fetch(ids=ids, namespace=namespace)
+    except Exception:
+        logging.exception("Pinecone fetch failed for %d ids", len(ids))
+        return {}
+    vectors = res.get("vectors") if isinstance(res, dict) else getattr(res, "vectors", None)
+    out = {}
+    for vid in ids:
+        values = _vector_values(vectors or {}, vid)
+        if values:
+            out[vid] = values
+    return out
+
+
+def fetch_vectors(
+    index,
+    ids: List[str],
+    namespace: str = DEFAULT_NAMESPACE,
+    batch_size: int = FETCH_BATCH_SIZE,
+    max_workers: int = FETCH_WORKERS,
+) -> Tuple[object, Dict[str, int]]:
+    """Fetch vectors for many IDs.
+
+    Returns (matrix, rows): `matrix` holds one vector per found ID (a float32
+    NumPy array of shape (n, dim), or a list of lists without NumPy) and
+    `rows` maps each found ID to its row. Missing IDs, failed chunks and
+    vectors of an unexpected dimension are absent from `rows`. Cached
+    vectors are used as-is; only the rest is fetched.
+    """
+    ids = [i for i in dict.fromkeys(ids or []) if i]
+    cache = get_vector_cache(config_section("pinecone")) if namespace == DEFAULT_NAMESPACE else None
+    found: Dict[str, list] = cache.get_many(ids) if cache is not None else {}
+    todo = [i for i in ids if i not in found]
+    if index is not None and todo:
+        fetched: Dict[str, list] = {}
+        chunks = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        if len(chunks) == 1:
+            fetched = _fetch_chunk(index, chunks[0], namespace)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+                for part in pool.map(lambda c: _fetch_chunk(index, c, namespace), chunks):
+                    fetched.update(part)
+        if cache is not None:
+            cache.put_many(fetched)
+        found.update(fetched)
+    return _pack(ids, found)
+
+
+def invalidate_vectors(ids: List[str]):
+    """Drop cached vectors for IDs that were just (re-)upserted."""
+    cache = get_vector_cache(config_section("pinecone"))
+    if cache is not None:
+        cache.invalidate(ids)
+
+
+def _pack(ids: List[str], found: Dict[str, list]):
+    dim = next((len(v) for v in found.values()), 0)
+    rows, vecs = {}, []
+    for vid in ids:
+        v = found.get(vid)
+        if v is not None and len(v) == dim:
+            rows[vid] = len(vecs)
+            vecs.append(v)
+    if np is not None:
+        return np.asarray(vecs, dtype=np.float32).reshape(len(vecs), dim), rows
+    return vecs, rows
+
+
+def _query_chunk(index, parent_id: str, ids: List[str], namespace: str) -> Dict[str, float]:
+    res = index.query(
+        id=parent_id,
+        top_k=len(ids),
+        filter={"paper_id": {"$in": ids}},
+        namespace=namespace,
+        include_values=False,
+        include_metadata=False,
+    )
+    matches = res.get("matches") if isinstance(res, dict) else getattr(res, "matches", None)
+    out = {}
+    for m in matches or []:
+        mid = m.get("id") if isinstance(m, dict) else getattr(m, "id", None)
+        score = m.get("score") if isinstance(m, dict) else getattr(m, "score", None)
+        if mid in ids and score is not None:
+            out[mid] = float(score)
+    return out
+
+
+def query_scores(
+    index,
+    parent_id: str,
+    ids: List[str],
+    namespace: str = DEFAULT_NAMESPACE,
+    batch_size: int = QUERY_BATCH_SIZE,
+    max_workers: int = FETCH_WORKERS,
+) -> Dict[str, float]:
+    """Similarity of `parent_id` to each of `ids`, computed by Pinecone.
+
+    Returns scores for the IDs the query matched; IDs without a vector, or
+    records written before `paper_id` was stored, are left out so the caller
+    can fall back to `fetch_vectors` for them. Raises when the query itself
+    fails (e.g. the parent has no vector).
+    """
+    ids = [i for i in dict.fromkeys(ids or []) if i]
+    if index is None or not parent_id or not ids:
+        return {}
+    chunks = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    if len(chunks) == 1:
+        return _query_chunk(index, parent_id, chunks[0], namespace)
+    out = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+        for part in pool.map(lambda c: _query_chunk(index, parent_id, c, namespace), chunks):
+            out.update(part)
+    return out
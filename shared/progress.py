@@ -0,0 +1,174 @@
+"""Progress reporting for DurableComputationOrchestrator runs.
+
+Progress lives under its own key, `progress:<requestFor>:<doi>`, so it never
+touches the result document `SaveCosmosRedis` keeps under `normalize_doi(doi)`.
+Each update is a small JSON status:
+
+    {"doi", "requestFor", "instanceId", "stage", "progress", "seq", "updatedAt"}
+
+It is written with a TTL and published on a Redis channel of the same name,
+so pollers (`ProgressStatus`) and subscribers (`ProgressStream`) see the same
+thing. `seq` grows with every update of a run and doubles as an event id;
+the starter's "queued" status (seq 0) marks the start of a new run.
+"""
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+from shared.clients import create_async_redis_client
+from shared.redis_client import get_redis_client, pipelined
+from shared.utils import normalize_doi
+
+KEY_PREFIX = "progress:"
+TTL_SECONDS = 24 * 3600
+
+# stage -> progress percentage reported when the stage starts
+STAGES = {
+    "queued": 0,
+    "crawling": 5,
+    "processing": 20,
+    "published": 20,
+    "scoring": 85,
+    "saving": 95,
+    "done": 100,
+    "partial": 100,
+}
+# stages after which a run reports nothing more
+TERMINAL_STAGES = ("done", "partial")
+
+
+def progress_key(doi: str, request_for: str) -> str:
+    return f"{KEY_PREFIX}{(request_for or '').lower()}:{normalize_doi(doi).lower()}"
+
+
+def make_status(doi, request_for, stage, progress=None, seq=0, instance_id=None, updated_at=None) -> dict:
+    return {
+        "doi": doi,
+        "requestFor": request_for,
+        "instanceId": instance_id,
+        "stage": stage,
+        "progress": int(STAGES.get(stage, 0) if progress is None else progress),
+        "seq": int(seq or 0),
+        "updatedAt": updated_at,
+    }
+
+
+def publish_progress(status: dict) -> bool:
+    """Store `status` under its progress key and publish it (one round trip)."""
+    r = get_redis_client()
+    if r is None or not status.get("doi"):
+        return False
+    key = progress_key(status["doi"], status.get("requestFor"))
+    value = json.dumps(status)
+    try:
+        pipelined(r, [("set", (key, value), {"ex": TTL_SECONDS}), ("publish", (key, value), {})])
+        return True
+    except Exception:
+        logging.warning("Publishing progress for %s failed", status.get("doi"), exc_info=True)
+        return False
+
+
+def _parse(value) -> Optional[dict]:
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    try:
+        status = json.loads(value)
+    except (TypeError, ValueError):
+        return None
+    return status if isinstance(status, dict) else None
+
+
+def get_progress(doi: str, request_for: str) -> Optional[dict]:
+    r = get_redis_client()
+    if r is None:
+        return None
+    try:
+        value = r.get(progress_key(doi, request_for))
+    except Exception:
+        logging.warning("Reading progress for %s failed", doi, exc_info=True)
+        return None
+    return _parse(value) if value is not None else None
+
+
+def _is_new(status: dict, last_seq: Optional[int]) -> bool:
+    seq = int(status.get("seq") or 0)
+    if last_seq is None or seq > last_seq:
+        return True
+    # seq starts over when the DOI is recomputed
+    return status.get("stage") == "queued" and seq != last_seq
+
+
+async def watch_progress(
+    doi: str,
+    request_for: str,
+    last_seq: Optional[int] = None,
+    timeout: float = 25.0,
+    poll_interval: float = 0.5,
+    linger: Optional[float] = None,
+) -> AsyncIterator[dict]:
+    """Yield progress statuses newer than `last_seq` for up to `timeout` seconds.
+
+    With `linger`, the watch ends that many seconds after the first status
+    is yielded instead, which picks up updates sent right behind it without
+    holding the first one back for the whole window.
+
+    Waiting never blocks a thread: with a redis:// URL the progress channel
+    is subscribed through `redis.asyncio`; otherwise (the Upstash REST
+    client has no pub/sub) the key is polled every `poll_interval` seconds
+    with `asyncio.sleep` in between, each read running in the executor.
+    Stops after a terminal stage, or right away when the latest status is
+    terminal and already seen.
+    """
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, get_redis_client) is None:
+        return
+    key = progress_key(doi, request_for)
+    client = create_async_redis_client()
+    pubsub = None
+    if client is not None:
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            # subscribe before reading the key so no update falls in between
+            await pubsub.subscribe(key)
+        except Exception:
+            logging.warning("Progress subscription failed; polling instead", exc_info=True)
+            pubsub = None
+
+    ends_at = loop.time() + timeout
+    try:
+        status = await loop.run_in_executor(None, get_progress, doi, request_for)
+        while True:
+            if status is not None:
+                if _is_new(status, last_seq):
+                    last_seq = int(status.get("seq") or 0)
+                    yield status
+                    if status.get("stage") in TERMINAL_STAGES:
+                        return
+                    if linger is not None:
+                        ends_at = min(ends_at, loop.time() + linger)
+                elif status.get("stage") in TERMINAL_STAGES and int(status.get("seq") or 0) == last_seq:
+                    return
+            remaining = ends_at - loop.time()
+            if remaining <= 0:
+                return
+            if pubsub is not None:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 1.0))
+                status = _parse(message.get("data")) if message else None
+            else:
+                await asyncio.sleep(min(remaining, poll_interval))
+                status = await loop.run_in_executor(None, get_progress, doi, request_for)
+    finally:
+        await _close(pubsub, client)
+
+
+async def _close(*resources):
+    for resource in resources:
+        if resource is None:
+            continue
+        try:
+            # redis-py 5 names it aclose(); 4.x has a coroutine close()
+            close = getattr(resource, "aclose", None) or resource.close
+            await close()
+        except Exception:
+            pass
@@ -0,0 +1,147 @@
+"""Fleet-wide OpenAlex request budget shared through Redis.
+
+Every Functions instance has its own in-process token bucket, but instances
+scale out independently, so the fleet as a whole can still exceed the
+OpenAlex per-second and per-day limits. `RedisRateLimiter` keeps a sliding
+window counter per second plus a daily counter in Redis so all workers draw
+from the same budget.
+
+The limiter fails open: if Redis is unreachable, calls are only throttled by
+the local bucket rather than blocked.
+"""
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from shared.redis_client import pipelined
+
+DEFAULT_PREFIX = "openalex:budget"
+# log a Redis outage at most this often instead of on every call
+FAIL_OPEN_LOG_INTERVAL = 60.0
+
+
+class BudgetExhausted(RuntimeError):
+    """Raised when the shared daily OpenAlex budget has been used up."""
+
+
+class RedisRateLimiter:
+    """Sliding-window (per second) and fixed-window (per day) limiter.
+
+    The per-second estimate weights the previous one-second window by how
+    much of it still overlaps the sliding window, which smooths the 2x burst
+    a plain fixed window allows at window boundaries.
+    """
+
+    def __init__(self, client, per_second: float = 10.0, per_day: int = 100000, prefix: str = DEFAULT_PREFIX):
+        self.client = client
+        self.per_second = float(per_second)
+        self.per_day = int(per_day)
+        self.prefix = prefix
+        # metrics
+        self.remaining_second: Optional[float] = None
+        self.remaining_day: Optional[int] = None
+        self.last_delay = 0.0
+        self.total_delay = 0.0
+        self.delayed_calls = 0
+        self.fail_open_calls = 0
+        self._fail_open_logged_at: Optional[float] = None
+
+    def _take(self, now: float):
+        """Optimistically register one call in a single round trip.
+
+        Returns (keys, sliding per-second estimate, calls used today); the
+        caller gives the slot back with `_give_back` when over budget.
+        """
+        window = int(now)
+        cur_key = f"{self.prefix}:s:{window}"
+        prev_key = f"{self.prefix}:s:{window - 1}"
+        day_key = f"{self.prefix}:d:{datetime.fromtimestamp(now, timezone.utc):%Y%m%d}"
+
+        cur, _, prev, day, _ = pipelined(
+            self.client,
+            [
+                ("incr", (cur_key,), {}),
+                ("expire", (cur_key, 3), {}),
+                ("get", (prev_key,), {}),
+                ("incr", (day_key,), {}),
+                ("expire", (day_key, 2 * 24 * 3600), {}),
+            ],
+        )
+
+        elapsed = now - window
+        estimate = float(prev or 0) * (1.0 - elapsed) + float(cur or 0)
+        return (cur_key, day_key), estimate, int(day or 0)
+
+    def _give_back(self, keys):
+        for key in keys:
+            try:
+                self.client.decr(key)
+            except Exception:
+                pass
+
+    def acquire(self) -> float:
+        """Block until the fleet has budget for one call; return the delay."""
+        waited = 0.0
+        while True:
+            now = time.time()
+            try:
+                keys, estimate, day_used = self._take(now)
+            except Exception:
+                self._fail_open()
+                return waited
+
+            if day_used > self.per_day:
+                self._give_back(keys)
+                self.remaining_day = 0
+                raise BudgetExhausted("OpenAlex daily request budget exhausted")
+
+            if estimate <= self.per_second:
+                self.remaining_second = max(0.0, self.per_second - estimate)
+                self.remaining_day = max(0, self.per_day - day_used)
+                self._record_delay(waited)
+                return waited
+
+            # over budget: give back the slot we took and wait for the window to slide
+            self._give_back(keys)
+            delay = (1.0 - (now - int(now))) + random.uniform(0, 0.05)
+            time.sleep(delay)
+            waited += delay
+
+    def _record_delay(self, waited: float):
+        self.last_delay = waited
+        if waited > 0:
+            self.total_delay += waited
+            self.delayed_calls += 1
+            logging.info(
+                "OpenAlex fleet budget: queued %.3fs, remaining %.1f/s and %s today",
+                waited,
+                self.remaining_second,
+                self.remaining_day,
+                extra={"custom_dimensions": self.metrics()},
+            )
+
+    def _fail_open(self):
+        self.fail_open_calls += 1
+        now = time.monotonic()
+        if self._fail_open_logged_at is not None and now - self._fail_open_logged_at < FAIL_OPEN_LOG_INTERVAL:
+            logging.debug("Redis rate limiter unavailable; relying on local limiter", exc_info=True)
+            return
+        self._fail_open_logged_at = now
+        logging.warning(
+            "Redis rate limiter unavailable; relying on local limiter (%d calls so far)",
+            self.fail_open_calls,
+            exc_info=True,
+        )
+
+    def metrics(self) -> dict:
+        """Current budget and queueing figures, suitable for logging/telemetry."""
+        return {
+            "openalex_remaining_per_second": self.remaining_second,
+            "openalex_remaining_per_day": self.remaining_day,
+            "openalex_queue_delay_last": self.last_delay,
+            "openalex_queue_delay_total": self.total_delay,
+            "openalex_delayed_calls": self.delayed_calls,
+            "openalex_fail_open_calls": self.fail_open_calls,
+        }
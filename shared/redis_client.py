@@ -3,65 +3,57 @@ and falls back to standard redis-py.
 
 This module keeps Redis usage in the codebase consistent and allows
 you to swap providers by installing the appropriate client library.
+The configured client is created once per process by `shared.clients`.
 """
-from typing import Optional
-import json
+from typing import Iterable, Optional, Tuple
 
-
-def _load_config() -> dict:
-    try:
-        return json.load(open("config.json"))
-    except Exception:
-        return {}
+from shared.clients import config_section, create_redis_client, get_redis
 
 
 def get_redis_client(url: Optional[str] = None):
     """Return a redis-like client.
 
     Behavior:
-    - If `url` is provided, try to create a client for that URL.
-    - If `url` is None, read `config.json` for `redis.url` and optional `redis.token`.
+    - If `url` is None, return the shared client for `redis.url` (and
+      optional `redis.token`) from `config.json`.
+    - If `url` is provided, create a new client for that URL.
 
     Prefers Upstash client (`upstash_redis.Redis`) when available, falling back to
     redis-py (`redis.from_url`). Returns None when no client can be created.
     """
-    cfg = _load_config()
-    redis_cfg = cfg.get("redis", {})
-    token = redis_cfg.get("token")
-
     if url is None:
-        url = redis_cfg.get("url")
+        return get_redis()
+    return create_redis_client(url, config_section("redis").get("token"))
+
+
+def execute_pipeline(pipe) -> list:
+    """Send the commands queued on `pipe` and return their results.
 
-    if not url:
-        return None
+    redis-py pipelines are sent with `execute()`; upstash-redis pipelines
+    with `exec()` (their `execute` runs a single command).
+    """
+    if type(pipe).__module__.split(".")[0] == "upstash_redis":
+        return pipe.exec()
+    return pipe.execute()
+
+
+def pipelined(r, commands: Iterable[Tuple[str, tuple, dict]]) -> list:
+    """Run `(method, args, kwargs)` commands on `r` in one round trip.
 
-    # Try Upstash client first
+    Falls back to issuing the commands one by one when the client has no
+    pipeline. Returns the results in order; errors are left to the caller.
+    """
     try:
-        import upstash_redis
-        # prefer explicit Redis constructor with token when available
-        try:
-            Redis = getattr(upstash_redis, "Redis", None)
-            if Redis is not None:
-                # upstash_redis.Redis(url=..., token=...)
-                try:
-                    return Redis(url=url, token=token) if token else Redis(url=url)
-                except TypeError:
-                    # fallback to from_url if signature differs
-                    if hasattr(Redis, "from_url"):
-                        return Redis.from_url(url)
-            # otherwise try module-level from_url
-            if hasattr(upstash_redis, "from_url"):
-                return upstash_redis.from_url(url)
-        except Exception:
-            # If Upstash import succeeds but client initialization fails, continue to fallback
-            pass
+        pipe = r.pipeline()
     except Exception:
-        upstash_redis = None
+        pipe = None
+    target = pipe if pipe is not None else r
+    results = [getattr(target, name)(*args, **kwargs) for name, args, kwargs in commands]
+    if pipe is None:
+        return results
+    return execute_pipeline(pipe)
 
-    # Fallback to redis-py
-    try:
-        import redis as redis_py
 
-        return redis_py.from_url(url)
-    except Exception:
-        return None
+def set_many(r, entries: Iterable[Tuple[str, str, Optional[int]]]) -> list:
+    """SET every `(key, value, ttl seconds)` entry in one round trip."""
+    return pipelined(r, [("set", (key, value), {"ex": ttl} if ttl else {}) for key, value, ttl in entries])
@@ -0,0 +1,119 @@
+"""Lookup of already-computed graph documents.
+
+`SaveCosmosRedis` stores the final document in Redis under
+`normalize_doi(doi)` and in Cosmos DB, stamping each direction with the time
+it was computed. The starter uses `get_cached_result` to answer repeat
+requests straight from those stores instead of starting an orchestration.
+"""
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from shared.clients import config_section, get_cosmos_container
+from shared.redis_client import get_redis_client
+from shared.utils import normalize_doi
+
+
+# direction -> (computed flag, computed-at timestamp field)
+COMPUTED_FLAGS = {"citating": "computedCitating", "references": "computedReferences"}
+COMPUTED_AT_FIELDS = {"citating": "computedCitatingAt", "references": "computedReferencesAt"}
+# set while a direction only holds a deadline-truncated (partial) graph
+PARTIAL_FIELDS = {"citating": "partialCitating", "references": "partialReferences"}
+
+DEFAULT_MAX_AGE_SECONDS = 24 * 3600
+
+
+def default_max_age() -> int:
+    """Freshness window from `cache.result_max_age_seconds` in config.json."""
+    try:
+        return int(config_section("cache").get("result_max_age_seconds") or DEFAULT_MAX_AGE_SECONDS)
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_AGE_SECONDS
+
+
+def is_fresh(doc: Optional[dict], request_for: str, max_age: int) -> bool:
+    """True when `doc` has `request_for` computed within the last `max_age` seconds."""
+    if not isinstance(doc, dict):
+        return False
+    if doc.get(COMPUTED_FLAGS.get(request_for, "")) != "Y":
+        return False
+    stamp = doc.get(COMPUTED_AT_FIELDS.get(request_for, ""))
+    if not stamp:
+        # documents written before timestamps existed are treated as stale
+        return False
+    try:
+        computed_at = datetime.fromisoformat(stamp)
+    except (TypeError, ValueError):
+        return False
+    return (datetime.now(timezone.utc) - computed_at).total_seconds() <= max_age
+
+
+def _from_redis(key: str) -> Optional[dict]:
+    r = get_redis_client()
+    if r is None:
+        return None
+    try:
+        raw = r.get(key)
+    except Exception:
+        logging.warning("Redis lookup for cached result failed", exc_info=True)
+        return None
+    if raw is None:
+        return None
+    try:
+        doc = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    # older deployments wrote a bare progress number to this key
+    return doc if isinstance(doc, dict) else None
+
+
+def _from_cosmos(key: str) -> Optional[dict]:
+    container = get_cosmos_container()
+    if container is None:
+        return None
+    try:
+        query = "SELECT * FROM c WHERE c.id = @id"
+        items = list(
+            container.query_items(
+                query=query, parameters=[{"name": "@id", "value": key}], enable_cross_partition_query=True
+            )
+        )
+        return items[0] if items else None
+    except Exception:
+        logging.warning("Cosmos lookup for cached result failed", exc_info=True)
+        return None
+
+
+def get_cached_result(doi: str, request_for: str, max_age: Optional[int] = None) -> Optional[dict]:
+    """Return a fresh stored document for `doi`/`request_for`, or None.
+
+    Redis is checked first; on a Cosmos hit the document is written back to
+    Redis so the next lookup stays on the fast path.
+    """
+    if max_age is None:
+        max_age = default_max_age()
+    key = normalize_doi(doi)
+    if not key:
+        return None
+
+    doc = _from_redis(key)
+    if is_fresh(doc, request_for, max_age):
+        return doc
+
+    doc = _from_cosmos(key)
+    if not is_fresh(doc, request_for, max_age):
+        return None
+    r = get_redis_client()
+    if r is not None:
+        try:
+            r.set(key, json.dumps(doc))
+        except Exception:
+            logging.warning("Could not backfill Redis with cached result", exc_info=True)
+    return doc
+
+
+def get_stored_result(doi: str) -> Optional[dict]:
+    """Return whatever document Redis holds for `doi`, fresh or partial."""
+    key = normalize_doi(doi)
+    return _from_redis(key) if key else None
@@ -0,0 +1,80 @@
+"""Cosine similarity of one parent vector against many child vectors.
+
+With NumPy the children are packed into one contiguous float32 matrix,
+rows are normalized once and all scores come out of a single
+matrix-vector product. Without NumPy a pure-Python loop is used that at
+least computes the parent norm only once.
+
+Missing (None/empty), zero or wrongly sized vectors score 0.0.
+"""
+import math
+from typing import List, Optional, Sequence
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+def _usable(vec, dim: int) -> bool:
+    return vec is not None and len(vec) == dim and dim > 0
+
+
+def cosine_scores_python(parent: Optional[Sequence[float]], children: List[Optional[Sequence[float]]]) -> List[float]:
+    if not parent:
+        return [0.0] * len(children)
+    dim = len(parent)
+    pn = math.sqrt(sum(x * x for x in parent))
+    if pn == 0:
+        return [0.0] * len(children)
+    out = []
+    for vec in children:
+        if not _usable(vec, dim):
+            out.append(0.0)
+            continue
+        n = math.sqrt(sum(x * x for x in vec))
+        out.append(sum(x * y for x, y in zip(parent, vec)) / (pn * n) if n else 0.0)
+    return out
+
+
+def matrix_scores(parent, matrix) -> List[float]:
+    """Scores for a ready-made (n, dim) float32 matrix; all-zero rows score 0.0."""
+    p = np.asarray(parent, dtype=np.float32)
+    pn = float(np.linalg.norm(p))
+    if matrix.shape[0] == 0 or pn == 0 or p.shape[0] != matrix.shape[1]:
+        return [0.0] * matrix.shape[0]
+    norms = np.linalg.norm(matrix, axis=1)
+    dots = matrix @ (p / pn)
+    safe = np.where(norms > 0, norms, 1.0)
+    return np.where(norms > 0, dots / safe, 0.0).astype(float).tolist()
+
+
+def cosine_scores_numpy(parent: Optional[Sequence[float]], children: List[Optional[Sequence[float]]]) -> List[float]:
+    if not parent:
+        return [0.0] * len(children)
+    dim = len(parent)
+    zero = [0.0] * dim
+    # one bulk conversion is far cheaper than filling the matrix row by row
+    rows = [vec if _usable(vec, dim) else zero for vec in children]
+    matrix = np.asarray(rows, dtype=np.float32).reshape(len(children), dim)
+    return matrix_scores(parent, matrix)
+
+
+def cosine_scores(parent: Optional[Sequence[float]], children: List[Optional[Sequence[float]]]) -> List[float]:
+    """Cosine similarity of `parent` with every vector in `children`, in order."""
+    if np is not None:
+        return cosine_scores_numpy(parent, children)
+    return cosine_scores_python(parent, children)
+
+
+def scores_for_rows(parent_id: str, child_ids: List[str], matrix, rows: dict) -> List[float]:
+    """Score children against the parent using a (matrix, rows) pair from
+    `shared.pinecone_client.fetch_vectors`; IDs without a row score 0.0."""
+    if parent_id not in rows:
+        return [0.0] * len(child_ids)
+    parent = matrix[rows[parent_id]]
+    if np is not None and hasattr(matrix, "shape"):
+        # score every fetched row at once, then pick the children out
+        all_scores = matrix_scores(parent, matrix)
+        return [all_scores[rows[c]] if c in rows else 0.0 for c in child_ids]
+    return cosine_scores_python(parent, [matrix[rows[c]] if c in rows else None for c in child_ids])
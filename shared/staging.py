@@ -0,0 +1,89 @@
+"""Claim-check staging for bulky activity payloads.
+
+Durable Task records every activity input and output in orchestration
+history and replays it on each `yield`. Instead of returning full metadata
+(including abstracts) to the orchestrator and passing it on to the next
+activity, activities stage it in Redis under `stage:<run id>:<doi>` and hand
+back a small reference `{"$ref": "<key>"}`. Consumers call `resolve` /
+`resolve_many` to get the payload back.
+
+When Redis is not available the payload is passed inline, so callers work
+the same either way.
+"""
+import logging
+from typing import Dict
+
+from shared.paper_store import decode_value, encode_value
+from shared.redis_client import get_redis_client, set_many
+from shared.utils import normalize_doi
+
+KEY_PREFIX = "stage:"
+REF_FIELD = "$ref"
+# long enough to outlive a slow run, short enough to clean up after itself
+TTL_SECONDS = 12 * 3600
+
+
+def stage_key(run_id: str, doi: str) -> str:
+    return f"{KEY_PREFIX}{run_id}:{normalize_doi(doi).lower()}"
+
+
+def is_ref(value) -> bool:
+    return isinstance(value, dict) and REF_FIELD in value
+
+
+def stage_many(run_id: str, payloads: Dict[str, dict]) -> Dict[str, dict]:
+    """Stage DOI -> payload entries; returns DOI -> reference.
+
+    Empty payloads and every payload when staging fails are returned inline.
+    """
+    if not run_id or not payloads:
+        return dict(payloads or {})
+    r = get_redis_client()
+    if r is None:
+        return dict(payloads)
+
+    out, entries = {}, []
+    for doi, payload in payloads.items():
+        if not payload:
+            out[doi] = payload or {}
+            continue
+        key = stage_key(run_id, doi)
+        entries.append((key, encode_value(payload), TTL_SECONDS))
+        out[doi] = {REF_FIELD: key}
+    try:
+        set_many(r, entries)
+    except Exception:
+        logging.warning("Staging payloads failed; passing them inline", exc_info=True)
+        return dict(payloads)
+    return out
+
+
+def resolve_many(values: Dict[str, dict]) -> Dict[str, dict]:
+    """Replace every reference in a DOI -> value map with its payload (one MGET)."""
+    out = {d: (v or {}) for d, v in (values or {}).items() if not is_ref(v)}
+    refs = {d: v[REF_FIELD] for d, v in (values or {}).items() if is_ref(v)}
+    if not refs:
+        return out
+    r = get_redis_client()
+    raw = []
+    if r is not None:
+        try:
+            raw = r.mget(*refs.values())
+        except Exception:
+            logging.warning("Resolving staged payloads failed", exc_info=True)
+    raw = list(raw or []) + [None] * (len(refs) - len(raw or []))
+    for (doi, key), value in zip(refs.items(), raw):
+        try:
+            out[doi] = decode_value(value) if value is not None else {}
+        except Exception:
+            out[doi] = {}
+        if value is None:
+            logging.warning("Staged payload %s missing or expired", key)
+    return out
+
+
+def resolve(value) -> dict:
+    """Resolve a single value that may be a reference."""
+    if not is_ref(value):
+        return value or {}
+    return resolve_many({"_": value}).get("_", {})
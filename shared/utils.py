@@ -1,3 +1,6 @@
+import hashlib
+
+
 def greet(name: str) -> str:
     """Return a greeting for the given name.
 
@@ -19,3 +22,16 @@ def normalize_doi(doi: str) -> str:
         d = d.split('.org/')[-1]
     # replace slashes with underscores for safe keys
     return d.replace('/', '_')
+
+
+def orchestration_instance_id(doi: str, request_for: str) -> str:
+    """Deterministic Durable instance ID for a DOI/direction pair.
+
+    Every request for the same paper and direction maps to the same instance,
+    so concurrent requests can share one run. The DOI is hashed because raw
+    DOIs may contain characters Durable instance IDs do not allow ('/', '#',
+    '?') and can exceed the 100 character limit.
+    """
+    key = normalize_doi(doi).lower()
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return f"graphi-{(request_for or '').lower()}-{digest}"
@@ -0,0 +1,209 @@
+"""Process-local cache of paper embeddings (normalized DOI -> float32 vector).
+
+The same root and gen1 vectors are read by ComputeScores and SaveCosmosRedis
+in one run, and again by every overlapping run. `fetch_vectors` in
+`shared.pinecone_client` reads through this cache and only asks Pinecone for
+what is missing; UpsertPinecone invalidates the papers it re-embeds.
+
+The in-memory part is an LRU bounded by `max_bytes` whose entries also
+expire after `memory_ttl` seconds, which bounds how long another worker's
+re-embed can go unnoticed. Optionally (`pinecone.vector_cache.redis`) vectors
+are shared across workers in Redis as base64-encoded little-endian float32
+under `vec:<id>`.
+
+Config (`pinecone.vector_cache` in config.json):
+    {"enabled": true, "max_bytes": 67108864, "memory_ttl": 3600,
+     "redis": false, "redis_ttl": 604800}
+"""
+import base64
+import logging
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from shared.redis_client import get_redis_client, set_many
+
+KEY_PREFIX = "vec:"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MEMORY_TTL = 3600
+DEFAULT_REDIS_TTL = 7 * 24 * 3600
+# rough per-entry bookkeeping (key, tuple, OrderedDict node)
+ENTRY_OVERHEAD = 200
+
+
+def _to_float32(values):
+    if np is not None:
+        return np.asarray(values, dtype=np.float32)
+    return array("f", values)
+
+
+def _nbytes(vec) -> int:
+    return vec.nbytes if hasattr(vec, "nbytes") else len(vec) * vec.itemsize
+
+
+def encode_vector(vec) -> str:
+    if np is not None:
+        raw = np.asarray(vec, dtype="<f4").tobytes()
+    else:
+        a = array("f", vec)
+        if sys.byteorder != "little":
+            a.byteswap()
+        raw = a.tobytes()
+    return base64.b64encode(raw).decode("ascii")
+
+
+def decode_vector(value):
+    if isinstance(value, bytes):
+        value = value.decode("ascii")
+    raw = base64.b64decode(value)
+    if np is not None:
+        return np.frombuffer(raw, dtype="<f4").astype(np.float32)
+    a = array("f")
+    a.frombytes(raw)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+
+class VectorCache:
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        memory_ttl: float = DEFAULT_MEMORY_TTL,
+        use_redis: bool = False,
+        redis_ttl: int = DEFAULT_REDIS_TTL,
+    ):
+        self.max_bytes = max_bytes
+        self.memory_ttl = memory_ttl
+        self.use_redis = use_redis
+        self.redis_ttl = redis_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= _nbytes(entry[0]) + ENTRY_OVERHEAD
+
+    def _remember(self, key: str, vec):
+        size = _nbytes(vec) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (vec, time.monotonic() + self.memory_ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, object]:
+        """Cached vectors for `ids` (memory first, then Redis); misses are left out."""
+        ids = list(ids or [])
+        out, pending = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for key in ids:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    out[key] = entry[0]
+                else:
+                    if entry is not None:
+                        self._drop(key)
+                    pending.append(key)
+        if pending and self.use_redis:
+            for key, vec in self._from_redis(pending).items():
+                self._remember(key, vec)
+                out[key] = vec
+        self.hits += len(out)
+        self.misses += len(ids) - len(out)
+        return out
+
+    def put_many(self, vectors: Dict[str, object]):
+        if not vectors:
+            return
+        converted = {k: _to_float32(v) for k, v in vectors.items() if k and v is not None and len(v)}
+        for key, vec in converted.items():
+            self._remember(key, vec)
+        if self.use_redis:
+            self._to_redis(converted)
+
+    def invalidate(self, ids: Iterable[str]):
+        keys = [k for k in ids or [] if k]
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+        if keys and self.use_redis:
+            r = get_redis_client()
+            if r is None:
+                return
+            try:
+                r.delete(*[KEY_PREFIX + k for k in keys])
+            except Exception:
+                logging.warning("Vector cache invalidation failed", exc_info=True)
+
+    def _from_redis(self, keys) -> Dict[str, object]:
+        r = get_redis_client()
+        if r is None:
+            return {}
+        try:
+            values = r.mget(*[KEY_PREFIX + k for k in keys])
+        except Exception:
+            logging.warning("Vector cache lookup failed", exc_info=True)
+            return {}
+        out = {}
+        for key, value in zip(keys, values or []):
+            if value is None:
+                continue
+            try:
+                out[key] = decode_vector(value)
+            except Exception:
+                continue
+        return out
+
+    def _to_redis(self, vectors: Dict[str, object]):
+        if not vectors:
+            return
+        r = get_redis_client()
+        if r is None:
+            return
+        try:
+            set_many(r, [(KEY_PREFIX + key, encode_vector(vec), self.redis_ttl) for key, vec in vectors.items()])
+        except Exception:
+            logging.warning("Vector cache write failed", exc_info=True)
+
+
+_cache: Optional[VectorCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_vector_cache(cfg: Optional[dict] = None) -> Optional[VectorCache]:
+    """Return the process-wide vector cache, or None when disabled.
+
+    `cfg` is the `pinecone` config section; it is only read on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_cfg = (cfg or {}).get("vector_cache") or {}
+                if cache_cfg.get("enabled") is False:
+                    return None
+                _cache = VectorCache(
+                    max_bytes=int(cache_cfg.get("max_bytes") or DEFAULT_MAX_BYTES),
+                    memory_ttl=float(cache_cfg.get("memory_ttl") or DEFAULT_MEMORY_TTL),
+                    use_redis=bool(cache_cfg.get("redis")),
+                    redis_ttl=int(cache_cfg.get("redis_ttl") or DEFAULT_REDIS_TTL),
+                )
+    return _cache